@@ -10,6 +10,7 @@ import sys
 import json
 import os
 import hashlib
+import heapq
 import threading
 import time
 from datetime import datetime
@@ -17,8 +18,9 @@ import socket
 import select
 import termios
 import tty
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 import random
 import urllib.request
 import urllib.parse
@@ -43,6 +45,26 @@ class MusicStreamer:
         "deep house mix"
     ]
     
+    # Один и тот же URL хранится ключом в cache_metadata['files'], полем 'url'
+    # трека, в плейлисте и в списке TUI — интернируем, чтобы это была одна строка
+    _intern_url = sys.intern
+
+    # Прямые загрузки от MIN_SEGMENTED_SIZE байт качаются параллельными
+    # Range-запросами: поток одного соединения сервер часто ограничивает
+    DOWNLOAD_SEGMENTS = 4
+    MIN_SEGMENTED_SIZE = 2 * 1024 * 1024
+
+    # Сколько следующих треков плейлиста докачивать заранее (параллельно)
+    PRELOAD_AHEAD = 2
+    # Доля текущего трека, после которой начинается докачка, пока скорость
+    # загрузки не измерена; дальше порог считает _prefetch_threshold
+    PRELOAD_PROGRESS = 0.5
+    # Запас (доля трека) на разброс скорости сети
+    PRELOAD_SAFETY_MARGIN = 0.1
+    # Прямые ссылки на следующие треки получаем заранее, на PRELOAD_PROGRESS;
+    # googlevideo-ссылки живут ~6 ч, держим их с запасом
+    RESOLVED_STREAM_TTL = 3600
+
     def __init__(self, cache_dir: str = None):
         self.playlist: List[Dict] = []
         self.current_index: int = 0
@@ -61,9 +83,19 @@ class MusicStreamer:
         # Файл с метаданными кеша
         self.cache_meta_file = self.cache_dir / "cache_metadata.json"
         self.cache_metadata = self._load_cache_metadata()
+        # Добавление/удаление записей и сохранение JSON из разных потоков
+        # (фоновые загрузки, очистка кеша)
+        self._metadata_lock = threading.RLock()
+        # URL, чьи файлы лежат в кеше: один scandir при старте, дальше
+        # поддерживается при скачивании и удалении
+        self._cached_urls = self._scan_cached_urls()
         
         # Для фонового кеширования
         self.download_threads: List[threading.Thread] = []
+        # Скорость загрузки в кеш, байт/с (EWMA); None — ещё не измеряли
+        self._dl_bps: Optional[float] = None
+        # video_id -> (прямая ссылка, момент истечения по time.monotonic())
+        self._resolved_streams: Dict[str, Tuple[str, float]] = {}
         
         # Состояние mpv
         self.mpv_process: Optional[subprocess.Popen] = None
@@ -128,7 +160,11 @@ class MusicStreamer:
                         raise ValueError("Metadata is not a dictionary")
                     # Обеспечиваем наличие ключей для сессии
                     if 'files' not in data:
-                        return {'files': data, 'last_session': None}
+                        data = {'files': data, 'last_session': None}
+                    data['files'] = self._intern_file_urls(data['files'])
+                    last_session = data.get('last_session')
+                    if isinstance(last_session, dict) and isinstance(last_session.get('playlist'), list):
+                        self._intern_track_urls(last_session['playlist'])
                     return data
             except (json.JSONDecodeError, ValueError, Exception) as e:
                 # Резервная копия поврежденного файла
@@ -141,11 +177,40 @@ class MusicStreamer:
                     self.logger.error(f"Failed to backup corrupted metadata: {ex}")
                 return {'files': {}, 'last_session': None}
         return {'files': {}, 'last_session': None}
-    
+
+    def _intern_file_urls(self, files: Dict) -> Dict:
+        """Интернировать URL-ключи словаря 'files' (на месте)"""
+        if not isinstance(files, dict):
+            return {}
+        # sys.intern() регистрирует сам объект строки, если равная ещё не
+        # интернирована, — ключи становятся каноническими URL без пересборки
+        for url in files:
+            self._intern_url(url)
+        return files
+
+    def _intern_track_urls(self, tracks: List[Dict]) -> List[Dict]:
+        """Интернировать поле 'url' у списка треков (на месте)"""
+        for track in tracks:
+            url = track.get('url')
+            if type(url) is str:
+                track['url'] = self._intern_url(url)
+        return tracks
+
     def _save_cache_metadata(self) -> None:
         """Сохранение метаданных кеша"""
-        with open(self.cache_meta_file, 'w', encoding='utf-8') as f:
-            json.dump(self.cache_metadata, f, ensure_ascii=False, indent=2)
+        # json.dump с indent пишет много мелких кусков — буфер 64 КБ
+        # сводит их к нескольким write() вместо сброса каждые 8 КБ.
+        # Пишем во временный файл своего потока и подменяем через os.replace:
+        # сохранения из разных потоков не перемешиваются, а сбой посреди
+        # записи не оставляет обрезанный JSON
+        tmp_path = self.cache_meta_file.with_name(
+            f"{self.cache_meta_file.name}.{threading.get_ident()}.tmp")
+        with self._metadata_lock:
+            with open(tmp_path, 'w', encoding='utf-8', buffering=65536) as f:
+                json.dump(self.cache_metadata, f, ensure_ascii=False, indent=2)
+            # Подмена тоже под замком: иначе более старый снимок может
+            # лечь поверх более нового
+            os.replace(tmp_path, self.cache_meta_file)
     
     def _get_cache_path(self, url: str) -> Path:
         """Получить путь к кешированному файлу (сначала проверяем метаданные)"""
@@ -159,16 +224,29 @@ class MusicStreamer:
         url_hash = hashlib.md5(url.encode()).hexdigest()
         return self.cache_dir / f"{url_hash}.m4a"
 
-    def _is_cached(self, url: str) -> bool:
-        """Проверить, есть ли файл в кеше (через метаданные или прямой путь)"""
-        if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
-            filename = self.cache_metadata['files'][url].get('filename')
-            if filename and (self.cache_dir / filename).exists():
-                return True
+    def _scan_cached_urls(self) -> set:
+        """URL из метаданных, чьи файлы есть в каталоге кеша (один scandir)"""
+        try:
+            with os.scandir(self.cache_dir) as it:
+                names = {entry.name for entry in it}
+        except OSError:
+            return set()
         
-        # Проверка по умолчанию
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-        return (self.cache_dir / f"{url_hash}.m4a").exists()
+        cached = set()
+        for url, meta in self.cache_metadata.get('files', {}).items():
+            filename = meta.get('filename')
+            if (filename and filename in names) or \
+                    f"{hashlib.md5(url.encode()).hexdigest()}.m4a" in names:
+                cached.add(url)
+        return cached
+
+    def _is_cached(self, url: str) -> bool:
+        """Проверить, есть ли файл в кеше (по индексу в памяти, без stat)"""
+        return url in self._cached_urls
+
+    def get_cached_urls(self, urls: List[str]) -> set:
+        """Какие из urls уже в кеше — одно пересечение множеств на всю пачку"""
+        return self._cached_urls.intersection(urls)
 
     def delete_from_cache(self, url: str) -> bool:
         """Удалить трек из кеша"""
@@ -182,11 +260,14 @@ class MusicStreamer:
             except OSError:
                 pass
         
+        self._cached_urls.discard(url)
+        
         # Remove metadata
-        if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
-            del self.cache_metadata['files'][url]
-            self._save_cache_metadata()
-            deleted = True
+        with self._metadata_lock:
+            if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
+                del self.cache_metadata['files'][url]
+                self._save_cache_metadata()
+                deleted = True
             
         return deleted
     
@@ -202,7 +283,7 @@ class MusicStreamer:
             client.send(msg.encode())
             client.close()
             return True
-        except:
+        except OSError:
             return False
 
     def _get_mpv_property(self, prop: str) -> Any:
@@ -219,9 +300,102 @@ class MusicStreamer:
             response = client.recv(4096).decode()
             client.close()
             data = json.loads(response.split('\n')[0])
-            return data.get('data')
-        except:
+        except (OSError, ValueError):
             return None
+        return data.get('data') if isinstance(data, dict) else None
+
+    def _get_mpv_properties(self, props: List[str]) -> Dict[str, Any]:
+        """Получить несколько свойств mpv за одно соединение.
+        
+        Все get_property отправляются сразу (mpv отвечает по request_id),
+        ответы дочитываются одним циклом recv. Не полученные свойства — None.
+        """
+        values: Dict[str, Any] = dict.fromkeys(props)
+        if not Path(self.mpv_socket).exists():
+            return values
+        
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.settimeout(0.2)
+                client.connect(self.mpv_socket)
+                request = "".join(
+                    json.dumps({"command": ["get_property", prop], "request_id": i}) + "\n"
+                    for i, prop in enumerate(props)
+                )
+                client.sendall(request.encode())
+                
+                pending = len(props)
+                buf = b""
+                while pending:
+                    chunk = client.recv(4096)
+                    if not chunk:
+                        break
+                    buf += chunk
+                    *lines, buf = buf.split(b"\n")
+                    for line in lines:
+                        try:
+                            reply = json.loads(line)
+                        except ValueError:
+                            continue
+                        # События (property-change и пр.) идут в тот же поток
+                        i = reply.get('request_id')
+                        if isinstance(i, int) and 0 <= i < len(props) and 'event' not in reply:
+                            values[props[i]] = reply.get('data')
+                            pending -= 1
+        except OSError:
+            pass
+        return values
+
+    def _observe_mpv_properties(self, props: List[str]) -> Iterator[Tuple[str, Any]]:
+        """Подписаться на свойства mpv и отдавать (имя, значение) при каждом изменении.
+        
+        Одно постоянное соединение вместо get_property на каждый опрос:
+        mpv сам присылает property-change (и текущее значение сразу после подписки).
+        Генератор завершается, когда mpv закрывает сокет или плеер остановлен.
+        """
+        if not Path(self.mpv_socket).exists():
+            return
+        
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.settimeout(1.0)
+            client.connect(self.mpv_socket)
+        except OSError:
+            return
+        
+        with client:
+            try:
+                request = "".join(
+                    json.dumps({"command": ["observe_property", i, prop]}) + "\n"
+                    for i, prop in enumerate(props, 1)
+                )
+                client.sendall(request.encode())
+            except OSError:
+                return
+            
+            buf = b""
+            while True:
+                try:
+                    chunk = client.recv(4096)
+                except socket.timeout:
+                    # Тишина от mpv: просто проверяем, жив ли ещё плеер
+                    if not self.mpv_process:
+                        return
+                    continue
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                
+                buf += chunk
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get('event') == 'property-change':
+                        yield event.get('name'), event.get('data')
 
     def _fade_out_and_stop(self) -> None:
         """Плавное затухание и остановка текущего плеера"""
@@ -265,12 +439,38 @@ class MusicStreamer:
                 self.current_pwa_index = (self.current_pwa_index + 1) % len(self.pwa_instances)
         return None
 
+    @staticmethod
+    def _video_id(track: Dict) -> str:
+        return track.get('video_id') or track['url'].split('v=')[-1]
+
+    def _resolve_upcoming_streams(self, current_pos: int) -> None:
+        """Заранее получить прямые ссылки для следующих некешированных треков"""
+        now = time.monotonic()
+        for track in self.playlist[current_pos + 1:current_pos + 1 + self.PRELOAD_AHEAD]:
+            video_id = self._video_id(track)
+            resolved = self._resolved_streams.get(video_id)
+            if self._is_cached(track['url']) or (resolved and resolved[1] > now):
+                continue
+            stream_url = self._resolve_stream_pwa(video_id)
+            if stream_url:
+                self._resolved_streams[video_id] = (stream_url, now + self.RESOLVED_STREAM_TTL)
+
+    def _take_resolved_stream(self, video_id: str) -> Optional[str]:
+        """Забрать заранее полученную ссылку, если она ещё не истекла"""
+        resolved = self._resolved_streams.pop(video_id, None)
+        if resolved and resolved[1] > time.monotonic():
+            return resolved[0]
+        return None
+
     def _download_direct(self, url: str, path: Path, show_progress: bool = True) -> bool:
         """Скачать файл напрямую по ссылке"""
         try:
             req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
             with urllib.request.urlopen(req, timeout=10) as response:
                 total_size = int(response.info().get('Content-Length', 0))
+                if total_size >= self.MIN_SEGMENTED_SIZE and \
+                        response.info().get('Accept-Ranges') == 'bytes':
+                    return self._download_segmented(url, response, path, total_size, show_progress)
                 block_size = 1024 * 64
                 downloaded = 0
                 
@@ -289,6 +489,63 @@ class MusicStreamer:
             self.logger.error(f"Direct download error for {url}: {e}")
             return False
 
+    def _download_segmented(self, url: str, response, path: Path, total_size: int,
+                            show_progress: bool) -> bool:
+        """Скачать файл DOWNLOAD_SEGMENTS кусками параллельно.
+        
+        Первый кусок дочитывается из уже открытого ответа, остальные —
+        Range-запросами в своих потоках; каждый пишет в свою часть файла.
+        """
+        block_size = 1024 * 64
+        seg = -(-total_size // self.DOWNLOAD_SEGMENTS)
+        bounds = [(start, min(start + seg, total_size)) for start in range(0, total_size, seg)]
+        done = [0] * len(bounds)
+        errors: List[Exception] = []
+        
+        with open(path, 'wb') as f:
+            f.truncate(total_size)
+        
+        def fetch(i: int, start: int, end: int, resp) -> None:
+            try:
+                if resp is None:
+                    req = urllib.request.Request(url, headers={
+                        'User-Agent': 'Mozilla/5.0', 'Range': f"bytes={start}-{end - 1}"})
+                    resp = urllib.request.urlopen(req, timeout=10)
+                    if resp.status != 206:
+                        resp.close()
+                        raise OSError(f"Range not honoured: HTTP {resp.status}")
+                with resp, open(path, 'r+b') as out:
+                    out.seek(start)
+                    remaining = end - start
+                    while remaining:
+                        buffer = resp.read(min(block_size, remaining))
+                        if not buffer:
+                            raise OSError("Connection closed before segment end")
+                        out.write(buffer)
+                        remaining -= len(buffer)
+                        done[i] += len(buffer)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [
+            threading.Thread(target=fetch, args=(i, start, end, response if i == 0 else None), daemon=True)
+            for i, (start, end) in enumerate(bounds)
+        ]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            if show_progress:
+                print(f"\r📥 Загрузка: {int(sum(done) * 100 / total_size)}%", end="", flush=True)
+            for t in threads:
+                t.join(0.2)
+        if show_progress: print()
+        
+        if errors:
+            self.logger.error(f"Segmented download error for {url}: {errors[0]}")
+            path.unlink(missing_ok=True)
+            return False
+        return True
+
     def _download_to_cache(self, track: Dict, show_progress: bool = True) -> bool:
         """Скачать трек в кеш"""
         url = track['url']
@@ -296,17 +553,19 @@ class MusicStreamer:
         
         if self._is_cached(url):
             return True
+        started = time.monotonic()
         
         if show_progress:
             title = track['title'][:50] + "..." if len(track['title']) > 50 else track['title']
             self.logger.info(f"Caching track: {title}")
 
         # 1. Пробуем через PWA API (быстрее)
-        video_id = track.get('video_id') or url.split('v=')[-1]
-        stream_url = self._resolve_stream_pwa(video_id)
+        video_id = self._video_id(track)
+        stream_url = self._take_resolved_stream(video_id) or self._resolve_stream_pwa(video_id)
         if stream_url:
             if self._download_direct(stream_url, cache_path, show_progress):
                 self._save_metadata_entry(track, cache_path, download_method="PWA")
+                self._record_download_speed(url, started)
                 # Запускаем фоновую очистку и скачивание субтитров после успешного скачивания
                 threading.Thread(target=self._enforce_cache_limit, daemon=True).start()
                 threading.Thread(target=self.download_subtitles, args=(url,), daemon=True).start()
@@ -328,6 +587,7 @@ class MusicStreamer:
         try:
             subprocess.run(cmd, check=True, capture_output=not show_progress)
             self._save_metadata_entry(track, cache_path, download_method="YTDLP")
+            self._record_download_speed(url, started)
             # Запускаем фоновую очистку и скачивание субтитров после успешного скачивания
             threading.Thread(target=self._enforce_cache_limit, daemon=True).start()
             threading.Thread(target=self.download_subtitles, args=(url,), daemon=True).start()
@@ -336,6 +596,38 @@ class MusicStreamer:
             self.logger.error(f"yt-dlp caching failed for {track['title']}: {e}")
             return False
 
+    def _record_download_speed(self, url: str, started: float) -> None:
+        """Обновить EWMA скорости загрузки по только что скачанному файлу"""
+        elapsed = time.monotonic() - started
+        try:
+            size = self._get_cache_path(url).stat().st_size
+        except OSError:
+            return
+        if elapsed <= 0 or not size:
+            return
+        bps = size / elapsed
+        self._dl_bps = bps if self._dl_bps is None else 0.7 * self._dl_bps + 0.3 * bps
+
+    def _audio_bytes_per_sec(self) -> float:
+        """Оценка размера секунды аудио по audio_quality из конфига ("128k")"""
+        try:
+            kbps = float(str(self.config.get("audio_quality", "128k")).lower().rstrip('k'))
+        except ValueError:
+            kbps = 128
+        return kbps * 1000 / 8
+
+    def _prefetch_threshold(self, track_duration: float, next_size_estimate: float) -> float:
+        """Доля текущего трека, с которой пора качать следующие.
+        
+        Начинаем так, чтобы загрузка (по измеренной скорости) закончилась
+        до конца трека с запасом PRELOAD_SAFETY_MARGIN: на медленной сети
+        раньше, на быстрой — позже, но не раньше PRELOAD_PROGRESS.
+        """
+        if not self._dl_bps or not track_duration:
+            return self.PRELOAD_PROGRESS
+        download_share = next_size_estimate / self._dl_bps / track_duration
+        return max(self.PRELOAD_PROGRESS, 1 - download_share - self.PRELOAD_SAFETY_MARGIN)
+
     def download_subtitles(self, url: str) -> Optional[str]:
         """Скачать субтитры (VTT) для трека"""
         cache_path = self._get_cache_path(url)
@@ -375,18 +667,19 @@ class MusicStreamer:
                     expected.rename(final_path)
                 
                 # Обновляем метаданные
-                if 'files' not in self.cache_metadata:
-                    self.cache_metadata['files'] = {}
-                
-                if url not in self.cache_metadata['files']:
-                    self.cache_metadata['files'][url] = {
-                        'title': 'Unknown',
-                        'uploader': 'Unknown',
-                        'duration': 0
-                    }
-                
-                self.cache_metadata['files'][url]['subtitle_path'] = str(final_path)
-                self._save_cache_metadata()
+                with self._metadata_lock:
+                    if 'files' not in self.cache_metadata:
+                        self.cache_metadata['files'] = {}
+                    
+                    if url not in self.cache_metadata['files']:
+                        self.cache_metadata['files'][url] = {
+                            'title': 'Unknown',
+                            'uploader': 'Unknown',
+                            'duration': 0
+                        }
+                    
+                    self.cache_metadata['files'][url]['subtitle_path'] = str(final_path)
+                    self._save_cache_metadata()
                 
                 return str(final_path)
         except Exception:
@@ -405,70 +698,83 @@ class MusicStreamer:
         if cache_path.exists():
             cache_path.rename(new_path)
         
-        if 'files' not in self.cache_metadata:
-            self.cache_metadata['files'] = {}
+        with self._metadata_lock:
+            if 'files' not in self.cache_metadata:
+                self.cache_metadata['files'] = {}
         
-        self.cache_metadata['files'][url] = {
-            'title': track['title'],
-            'uploader': track['uploader'],
-            'duration': track['duration'],
-            'cached_at': str(new_path.stat().st_mtime),
-            'downloaded_at': self.cache_metadata['files'].get(url, {}).get('downloaded_at', datetime.now().strftime("%Y-%m-%d %H:%M")), # Keep original or set new
-            'filename': new_path.name,
-            'search_method': search_method,
-            'download_method': download_method,
-            'play_count': self.cache_metadata['files'].get(url, {}).get('play_count', 0),
-            'last_played_at': self.cache_metadata['files'].get(url, {}).get('last_played_at'),
-            'is_liked': self.cache_metadata['files'].get(url, {}).get('is_liked', False),
-            'is_disliked': self.cache_metadata['files'].get(url, {}).get('is_disliked', False),
-            'subtitle_path': self.cache_metadata['files'].get(url, {}).get('subtitle_path')
-        }
-        self._save_cache_metadata()
+            self.cache_metadata['files'][url] = {
+                'title': track['title'],
+                'uploader': track['uploader'],
+                'duration': track['duration'],
+                'cached_at': str(new_path.stat().st_mtime),
+                'downloaded_at': self.cache_metadata['files'].get(url, {}).get('downloaded_at', datetime.now().strftime("%Y-%m-%d %H:%M")), # Keep original or set new
+                'filename': new_path.name,
+                'search_method': search_method,
+                'download_method': download_method,
+                'play_count': self.cache_metadata['files'].get(url, {}).get('play_count', 0),
+                'last_played_at': self.cache_metadata['files'].get(url, {}).get('last_played_at'),
+                'is_liked': self.cache_metadata['files'].get(url, {}).get('is_liked', False),
+                'is_disliked': self.cache_metadata['files'].get(url, {}).get('is_disliked', False),
+                'subtitle_path': self.cache_metadata['files'].get(url, {}).get('subtitle_path')
+            }
+            self._cached_urls.add(url)
+            self._save_cache_metadata()
         self.logger.info(f"Successfully cached: {track['title']} via {download_method}")
 
-    def increment_play_count(self, url: str) -> None:
-        """Увеличить счетчик проигрываний"""
-        if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
-            current = self.cache_metadata['files'][url].get('play_count', 0)
-            self.cache_metadata['files'][url]['play_count'] = current + 1
-            self.cache_metadata['files'][url]['last_played_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-            self._save_cache_metadata()
+    def increment_play_count(self, url: str, save: bool = True) -> None:
+        """Увеличить счетчик проигрываний (save=False — сохранит вызывающий)"""
+        # Меняем под тем же замком, под которым сохранение делает json.dump
+        with self._metadata_lock:
+            if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
+                current = self.cache_metadata['files'][url].get('play_count', 0)
+                self.cache_metadata['files'][url]['play_count'] = current + 1
+                self.cache_metadata['files'][url]['last_played_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
+                if save:
+                    self._save_cache_metadata()
 
-    def toggle_like(self, url: str) -> bool:
-        """Переключить статус 'лайка'"""
-        if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
-            # Если трек дизлайкнут, то лайк просто снимает дизлайк (нейтральное состояние)
-            if self.cache_metadata['files'][url].get('is_disliked', False):
-                self.cache_metadata['files'][url]['is_disliked'] = False
-                self._save_cache_metadata()
-                return False # Теперь нейтрально
+    def toggle_like(self, url: str, save: bool = True) -> bool:
+        """Переключить статус 'лайка' (save=False — сохранит вызывающий)"""
+        # Меняем под тем же замком, под которым сохранение делает json.dump
+        with self._metadata_lock:
+            if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
+                # Если трек дизлайкнут, то лайк просто снимает дизлайк (нейтральное состояние)
+                if self.cache_metadata['files'][url].get('is_disliked', False):
+                    self.cache_metadata['files'][url]['is_disliked'] = False
+                    if save:
+                        self._save_cache_metadata()
+                    return False # Теперь нейтрально
                 
-            current = self.cache_metadata['files'][url].get('is_liked', False)
-            new_status = not current
-            self.cache_metadata['files'][url]['is_liked'] = new_status
-            if new_status:
-                self.cache_metadata['files'][url]['is_disliked'] = False
-            self._save_cache_metadata()
-            return new_status
-        return False
+                current = self.cache_metadata['files'][url].get('is_liked', False)
+                new_status = not current
+                self.cache_metadata['files'][url]['is_liked'] = new_status
+                if new_status:
+                    self.cache_metadata['files'][url]['is_disliked'] = False
+                if save:
+                    self._save_cache_metadata()
+                return new_status
+            return False
 
-    def toggle_dislike(self, url: str) -> bool:
-        """Переключить статус 'дизлайка'"""
-        if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
-            # Если трек лайкнут, то дизлайк просто снимает лайк (нейтральное состояние)
-            if self.cache_metadata['files'][url].get('is_liked', False):
-                self.cache_metadata['files'][url]['is_liked'] = False
-                self._save_cache_metadata()
-                return False # Теперь нейтрально
+    def toggle_dislike(self, url: str, save: bool = True) -> bool:
+        """Переключить статус 'дизлайка' (save=False — сохранит вызывающий)"""
+        # Меняем под тем же замком, под которым сохранение делает json.dump
+        with self._metadata_lock:
+            if 'files' in self.cache_metadata and url in self.cache_metadata['files']:
+                # Если трек лайкнут, то дизлайк просто снимает лайк (нейтральное состояние)
+                if self.cache_metadata['files'][url].get('is_liked', False):
+                    self.cache_metadata['files'][url]['is_liked'] = False
+                    if save:
+                        self._save_cache_metadata()
+                    return False # Теперь нейтрально
                 
-            current = self.cache_metadata['files'][url].get('is_disliked', False)
-            new_status = not current
-            self.cache_metadata['files'][url]['is_disliked'] = new_status
-            if new_status:
-                self.cache_metadata['files'][url]['is_liked'] = False
-            self._save_cache_metadata()
-            return new_status
-        return False
+                current = self.cache_metadata['files'][url].get('is_disliked', False)
+                new_status = not current
+                self.cache_metadata['files'][url]['is_disliked'] = new_status
+                if new_status:
+                    self.cache_metadata['files'][url]['is_liked'] = False
+                if save:
+                    self._save_cache_metadata()
+                return new_status
+            return False
 
     def get_track_stats(self, url: str) -> Dict:
         """Получить статистику трека"""
@@ -489,9 +795,15 @@ class MusicStreamer:
             max_size_mb = self.config.get("max_cache_size_mb", 10240) # 10 GB default
             max_size_bytes = max_size_mb * 1024 * 1024
             
-            # 1. Считаем текущий размер
-            files = list(self.cache_dir.glob("*.m4a"))
-            total_size = sum(f.stat().st_size for f in files)
+            # 1. Считаем текущий размер: один проход scandir, stat() у DirEntry
+            # кешируется, так что размер и mtime берутся без повторных вызовов
+            files = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.m4a') and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry, st.st_size, st.st_mtime))
+            total_size = sum(size for _, size, _ in files)
             
             if total_size <= max_size_bytes:
                 return
@@ -500,30 +812,25 @@ class MusicStreamer:
             
             # 2. Собираем информацию о файлах для сортировки
             candidates = []
-            for f in files:
-                url = None
-                # Пытаемся найти URL по имени файла в метаданных (обратный поиск)
-                # Это медленно, но надежно. Или можно хранить filename -> url маппинг
-                # Для скорости просто проитерируемся один раз по метаданным
-                pass
             
             # Build filename -> metadata map
             filename_map = {}
-            if 'files' in self.cache_metadata:
-                for u, meta in self.cache_metadata['files'].items():
-                    fname = meta.get('filename')
-                    if fname:
-                        filename_map[fname] = {'url': u, **meta}
+            with self._metadata_lock:
+                files_meta = list(self.cache_metadata.get('files', {}).items())
+            for u, meta in files_meta:
+                fname = meta.get('filename')
+                if fname:
+                    filename_map[fname] = {'url': u, **meta}
 
             current_playing_url = None
             if self.playlist and 0 <= self.current_index < len(self.playlist):
                 current_playing_url = self.playlist[self.current_index]['url']
 
-            for f in files:
-                meta = filename_map.get(f.name)
+            for entry, size, mtime in files:
+                meta = filename_map.get(entry.name)
                 
                 # Timestamp скачивания
-                ts_download = f.stat().st_mtime
+                ts_download = mtime
                 if meta and meta.get('downloaded_at'):
                     try:
                         dt = datetime.strptime(meta['downloaded_at'], "%Y-%m-%d %H:%M")
@@ -545,20 +852,29 @@ class MusicStreamer:
                     effective_ts = float('inf') 
                 
                 candidates.append({
-                    'path': f,
-                    'size': f.stat().st_size,
+                    'path': Path(entry.path),
+                    'size': size,
                     'ts': effective_ts,
                     'url': meta['url'] if meta else None
                 })
             
-            # 3. Сортируем: сначала старые (меньший ts)
-            candidates.sort(key=lambda x: x['ts'])
+            # 3. Берем самые старые (меньший ts). Обычно удалять нужно несколько
+            # файлов из тысяч, поэтому heapq.nsmallest (O(N log k)) вместо полной
+            # сортировки; k оцениваем по среднему размеру файла с запасом x2
+            over_bytes = total_size - max_size_bytes
+            avg_size = max(1, total_size // len(candidates))
+            k = max(1, over_bytes // avg_size) * 2
+            by_ts = itemgetter('ts')
+            oldest = heapq.nsmallest(k, candidates, key=by_ts)
+            if sum(c['size'] for c in oldest if c['ts'] != float('inf')) < over_bytes:
+                # Оценка не добрала нужный объем — полная сортировка
+                oldest = sorted(candidates, key=by_ts)
             
             # 4. Удаляем пока не впишемся в лимит
             deleted_count = 0
             freed_space = 0
             
-            for item in candidates:
+            for item in oldest:
                 if total_size <= max_size_bytes:
                     break
                 
@@ -572,8 +888,10 @@ class MusicStreamer:
                     deleted_count += 1
                     
                     # Удаляем из метаданных
-                    if item['url'] and item['url'] in self.cache_metadata.get('files', {}):
-                        del self.cache_metadata['files'][item['url']]
+                    self._cached_urls.discard(item['url'])
+                    with self._metadata_lock:
+                        if item['url'] and item['url'] in self.cache_metadata.get('files', {}):
+                            del self.cache_metadata['files'][item['url']]
                 except:
                     pass
             
@@ -584,42 +902,61 @@ class MusicStreamer:
         except Exception as e:
             print(f"⚠️ Ошибка при очистке кеша: {e}")
     
-    def _ensure_next_track_cached(self, current_pos: int) -> bool:
-        """Ensure the next track in playlist is cached"""
-        next_pos = current_pos + 1
+    def _ensure_next_track_cached(self, current_pos: int, ahead: Optional[int] = None) -> bool:
+        """Ensure the next `ahead` tracks in playlist are cached, downloading them in parallel"""
+        if ahead is None:
+            ahead = self.PRELOAD_AHEAD
+        upcoming = [t for t in self.playlist[current_pos + 1:current_pos + 1 + ahead]
+                    if not self._is_cached(t['url'])]
         
-        # Check if there is a next track
-        if next_pos >= len(self.playlist):
-            return True  # No next track, nothing to do
+        # No next track or all already cached: nothing to do
+        if not upcoming:
+            return True
         
-        next_track = self.playlist[next_pos]
+        results = [False] * len(upcoming)
         
-        # If already cached, we're good
-        if self._is_cached(next_track['url']):
-            return True
+        def fetch(i: int, track: Dict) -> None:
+            try:
+                results[i] = self._download_to_cache(track, show_progress=False)
+            except Exception:
+                results[i] = False
         
-        # Download synchronously (blocking) to ensure it's ready
-        try:
-            return self._download_to_cache(next_track, show_progress=False)
-        except Exception:
-            return False
+        # Wait for all of them (blocking) to ensure they are ready
+        threads = [threading.Thread(target=fetch, args=(i, t), daemon=True)
+                   for i, t in enumerate(upcoming)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return all(results)
     
     def _monitor_playback_and_preload(self) -> None:
         """Monitor playback and preload next track before current finishes"""
         last_preloaded_pos = -1
+        last_resolved_pos = -1
         
         while self.mpv_process:
             try:
-                playlist_pos = self._get_mpv_property('playlist-pos')
-                time_pos = self._get_mpv_property('time-pos')
-                duration = self._get_mpv_property('duration')
+                state = self._get_mpv_properties(['playlist-pos', 'time-pos', 'duration'])
+                playlist_pos = state['playlist-pos']
+                time_pos = state['time-pos']
+                duration = state['duration']
                 
                 if playlist_pos is not None and time_pos and duration:
-                    # Check if we're 80% through current track
+                    # Check if we're far enough through current track
                     progress = time_pos / duration
+                    # Ссылки получаем раньше загрузки: при быстрой сети
+                    # докачка стартует ближе к концу трека
+                    if progress >= self.PRELOAD_PROGRESS and playlist_pos != last_resolved_pos:
+                        self._resolve_upcoming_streams(playlist_pos)
+                        last_resolved_pos = playlist_pos
+                    upcoming = self.playlist[playlist_pos + 1:playlist_pos + 1 + self.PRELOAD_AHEAD]
+                    next_size = sum(self._parse_duration(t.get('duration', 0)) for t in upcoming) \
+                        * self._audio_bytes_per_sec()
                     
-                    if progress >= 0.8 and playlist_pos != last_preloaded_pos:
-                        # Ensure next track is ready
+                    if progress >= self._prefetch_threshold(duration, next_size) and \
+                            playlist_pos != last_preloaded_pos:
+                        # Ensure next tracks are ready
                         if self._ensure_next_track_cached(playlist_pos):
                             last_preloaded_pos = playlist_pos
                 
@@ -717,7 +1054,7 @@ class MusicStreamer:
 
                             print(f"✅ Найдено (yt-putty): {len(validated_videos)}")
                             self.logger.info(f"yt-putty found {len(validated_videos)} results for: {query}")
-                            return validated_videos[:max_results]
+                            return self._intern_track_urls(validated_videos[:max_results])
                     except json.JSONDecodeError:
                         pass
         except Exception as e:
@@ -728,14 +1065,14 @@ class MusicStreamer:
         if videos:
             for v in videos: v['search_method'] = 'PWA-PY'
             self.logger.info(f"PWA-PY found {len(videos)} results for: {query}")
-            return videos
+            return self._intern_track_urls(videos)
 
         # 3. Добавляем прямой YouTubei поиск на Python (быстро и без ключей)
         videos = self._search_youtubei_python(query, max_results)
         if videos:
             for v in videos: v['search_method'] = 'YTI-PY'
             self.logger.info(f"YTI-PY found {len(videos)} results for: {query}")
-            return videos
+            return self._intern_track_urls(videos)
             
         if self.pwa_mode:
             self.logger.info("PWA Mode: Skipping yt-dlp search fallback")
@@ -773,9 +1110,9 @@ class MusicStreamer:
                 filtered = [v for v in videos if v.get('duration') is None or v.get('duration') <= max_dur]
                 if len(filtered) < len(videos):
                     print(f"✂️  Отфильтровано по длительности: {len(videos) - len(filtered)}")
-                return filtered[:max_results]
+                return self._intern_track_urls(filtered[:max_results])
                 
-            return videos[:max_results]
+            return self._intern_track_urls(videos[:max_results])
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             if isinstance(e, FileNotFoundError):
                 self.logger.warning("yt-dlp binary not found during fallback search")
@@ -796,7 +1133,7 @@ class MusicStreamer:
                 if len(parts) == 2: secs = int(parts[0])*60 + int(parts[1])
                 elif len(parts) == 3: secs = int(parts[0])*3600 + int(parts[1])*60 + int(parts[2])
                 return secs
-            except: pass
+            except ValueError: pass
         return 0
 
     def _search_youtubei_python(self, query: str, max_results: int) -> List[Dict]:
@@ -1069,6 +1406,7 @@ class MusicStreamer:
         if confirm == 'y':
             for f in files:
                 f.unlink()
+            self._cached_urls.clear()
             self.cache_metadata['files'] = {}
             self._save_cache_metadata()
             print("✅ Кеш очищен")
@@ -1098,13 +1436,14 @@ class MusicStreamer:
         """Фоновый поток для обновления строки прогресса"""
         while True:
             if self.mpv_process and self.mpv_process.poll() is None:
-                time_pos = self._get_mpv_property("time-pos")
-                duration = self._get_mpv_property("duration")
-                paused = self._get_mpv_property("pause")
-                
-                # Попробуем получить информацию о текущем и следующем треке
-                playlist_pos = self._get_mpv_property("playlist-pos")
-                playlist_count = self._get_mpv_property("playlist-count")
+                # Время и информация о текущем и следующем треке — одним запросом
+                state = self._get_mpv_properties(
+                    ["time-pos", "duration", "pause", "playlist-pos", "playlist-count"])
+                time_pos = state["time-pos"]
+                duration = state["duration"]
+                paused = state["pause"]
+                playlist_pos = state["playlist-pos"]
+                playlist_count = state["playlist-count"]
                 
                 title = "Музыка"
                 next_title = ""
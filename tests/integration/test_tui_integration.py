@@ -1,5 +1,9 @@
+import os
 import pytest
+import queue
 import sys
+import tempfile
+import threading
 import time
 from unittest.mock import MagicMock, patch, ANY
 from pathlib import Path
@@ -48,6 +52,7 @@ def mock_streamer():
             'play_count': 0, 'is_liked': False, 'is_disliked': False
         }
         instance._is_cached.return_value = False
+        instance.get_cached_urls.return_value = set()
         instance.format_duration.return_value = "3:30"
         yield instance
 
@@ -138,8 +143,8 @@ def test_tui_metadata_toggles(mock_stdscr, mock_streamer):
     
     app.run()
     
-    mock_streamer.toggle_like.assert_called_with('url1')
-    mock_streamer.toggle_dislike.assert_called_with('url1')
+    mock_streamer.toggle_like.assert_called_with('url1', save=False)
+    mock_streamer.toggle_dislike.assert_called_with('url1', save=False)
 
 def test_tui_delete_action(mock_stdscr, mock_streamer):
     app = TUI(mock_stdscr)
@@ -235,8 +240,24 @@ def test_tui_auto_recommendations(mock_stdscr, mock_streamer):
         time.sleep(0.1)
         
     assert app.recommendations_added is True
+    app._bg_queue.join()
     assert any(t['url'] == 'rec1' for t in app.tracks)
 
+def test_tui_selection_move_redraws_only_tracks(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': f'Track {i}', 'url': f'url{i}'} for i in range(5)]
+    app.selection_index = 0
+
+    mock_stdscr.getch.side_effect = [258, -1, 27, -1]
+    with patch.object(app, 'draw_header', wraps=app.draw_header) as header, \
+         patch.object(app, 'draw_track', wraps=app.draw_track) as track:
+        app.run()
+
+    assert app.selection_index == 1
+    # One full frame, then only the two tracks whose selection changed
+    assert header.call_count == 1
+    assert [c.args[0]['index'] for c in track.call_args_list[-2:]] == [0, 1]
+
 def test_tui_virtual_scrolling(mock_stdscr, mock_streamer):
     app = TUI(mock_stdscr)
     # Add many tracks
@@ -259,6 +280,44 @@ def test_tui_virtual_scrolling(mock_stdscr, mock_streamer):
     # scroll_y should be around 120 + 3 - 48 = 75
     assert app.scroll_y > 0
 
+def test_tui_wide_title_truncation(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    # 16 wide characters need 32 cells, more than the 10 available
+    line = app._compose_track_line(" ", "日本語" * 5 + "x", 0, 0, 17, 60)
+
+    assert line.startswith("   日本語日本")
+    assert line.endswith("3:30".rjust(8))
+    assert len(line) == 3 + 5 + 8
+
+def test_tui_cache_enqueue_dedup_and_bound(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    # The worker stays blocked on the original queue, so nothing is consumed
+    app.cache_queue = queue.Queue(maxsize=TUI.CACHE_QUEUE_SIZE)
+
+    tracks = [{'title': 'T', 'url': 'u'}, {'title': 'T2', 'url': 'u2'}]
+    app._enqueue_cache(tracks)
+    app._enqueue_cache(tracks)
+    assert app.cache_queue.qsize() == 1
+    assert app.cache_queue.get_nowait() == tracks
+
+    for i in range(TUI.CACHE_QUEUE_SIZE + 5):
+        app._enqueue_cache([{'title': f'T{i}', 'url': f'u{i}'}])
+    assert app.cache_queue.qsize() == TUI.CACHE_QUEUE_SIZE
+
+def test_tui_active_subtitle_cue(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    with tempfile.NamedTemporaryFile('w', suffix='.vtt', delete=False) as f:
+        f.write("WEBVTT\n\n00:00:01.000 --> 00:00:02.500\nFirst\n\n"
+                "00:00:04.000 --> 00:00:05.000\nSecond\n")
+    try:
+        assert app._active_cue(f.name, 0.5) is None
+        assert app._active_cue(f.name, 1.0) == 'First'
+        assert app._active_cue(f.name, 3.0) is None
+        assert app._active_cue(f.name, 4.5) == 'Second'
+        assert len(app.subtitle_cache) == 1
+    finally:
+        os.unlink(f.name)
+
 def test_tui_duplicate_search_handling(mock_stdscr, mock_streamer):
     app = TUI(mock_stdscr)
     app.tracks = [{'title': 'Existing', 'url': 'existing_url'}]
@@ -319,7 +378,7 @@ def test_tui_incremental_search_loading(mock_stdscr, mock_streamer):
     
     app.run()
     
-    # During the search thread, it appends with time.sleep(0.5)
+    # Results are appended at once; the UI loop only staggers their reveal
     # We just verify it eventually gets them all
     timeout = 10
     start_time = time.time()
@@ -515,3 +574,175 @@ def test_tui_search_visual_feedback(mock_stdscr, mock_streamer):
 
     assert mock_streamer.search.called
 
+
+def test_tui_recommendations_prefetch_before_last_track(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': f'T{i}', 'url': f'u{i}'} for i in range(4)]
+    mock_streamer.playlist = list(app.tracks)
+    mock_streamer.mpv_process = MagicMock()
+    app._add_recommendations_thread = MagicMock()
+
+    app.mpv_state['playlist-pos'] = 1
+    app._check_and_add_recommendations()
+    assert not app.recommendations_added
+    assert app._last_checked_pos == (1, 4)
+
+    app.mpv_state['playlist-pos'] = 4 - TUI.PREFETCH_LOOKAHEAD
+    app._check_and_add_recommendations()
+    assert app.recommendations_added
+
+def test_tui_recommendations_added_as_one_batch(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': 'Track 1', 'url': 'url1'}]
+    mock_streamer.get_recommendations.return_value = [
+        {'title': 'Rec 1', 'url': 'rec1'},
+        {'title': 'Dup', 'url': 'url1'},
+        {'title': 'Rec 1 again', 'url': 'rec1'},
+        {'title': 'Rec 2', 'url': 'rec2'},
+    ]
+
+    app._add_recommendations_thread(app.tracks[0])
+
+    assert [t['url'] for t in app.tracks] == ['url1', 'rec1', 'rec2']
+    assert app._by_url['rec2'] is app.tracks[2]
+    assert "2" in app.msg
+
+def test_tui_cache_batch_downloads_overlap(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    mock_streamer._download_to_cache.side_effect = lambda track, show_progress: time.sleep(0.3) or True
+
+    tracks = [{'title': f'T{i}', 'url': f'u{i}'} for i in range(TUI.CACHE_WORKERS)]
+    start = time.monotonic()
+    app._enqueue_cache(tracks)
+    app.cache_queue.join()
+
+    assert time.monotonic() - start < 0.3 * TUI.CACHE_WORKERS
+    assert all(t['is_cached'] for t in tracks)
+    assert {app._cache_status[t['url']] for t in tracks} == {'done'}
+
+def test_tui_cache_gives_up_after_repeated_failures(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    mock_streamer._download_to_cache.return_value = False
+
+    track = {'title': 'Broken', 'url': 'bad'}
+    for _ in range(TUI.CACHE_MAX_FAILURES + 2):
+        app._enqueue_cache([track])
+        app.cache_queue.join()
+
+    assert mock_streamer._download_to_cache.call_count == TUI.CACHE_MAX_FAILURES
+    assert app._cache_status['bad'] == 'failed'
+    assert "Broken" in app.msg
+
+def test_tui_cache_failure_message_is_drawn(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    mock_streamer._download_to_cache.return_value = False
+    track = {'title': 'Broken', 'url': 'bad'}
+    
+    def fail_while_waiting():
+        # The cache worker gives up while the UI loop sits in getch()
+        for _ in range(TUI.CACHE_MAX_FAILURES):
+            app._enqueue_cache([track])
+            app.cache_queue.join()
+        return -1
+    keys = iter([fail_while_waiting, lambda: -1, lambda: 27, lambda: -1])
+    mock_stdscr.getch.side_effect = lambda: next(keys, lambda: -1)()
+    
+    with patch.object(app, '_put', wraps=app._put) as mock_put:
+        app.run()
+    
+    assert any("Cache failed: Broken" in str(c.args[2]) for c in mock_put.call_args_list)
+
+def test_tui_like_not_blocked_by_recommendations(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': 'Track 1', 'url': 'url1'}]
+    app.selection_index = 0
+    saved = threading.Event()
+    mock_streamer._save_cache_metadata.side_effect = saved.set
+    # A slow network job is already running on the background worker
+    release = threading.Event()
+    app._bg_queue.put((release.wait, (5,)))
+    
+    try:
+        app._handle_key(ord('l'))
+        # The toggle is applied on the key path; only the save is deferred
+        mock_streamer.toggle_like.assert_called_once_with('url1', save=False)
+        assert saved.wait(1)
+    finally:
+        release.set()
+    app._bg_queue.join()
+
+def test_tui_background_downloads_keep_slow_tick(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    # Downloads in flight draw nothing animated: no fast tick for them
+    app.subs_downloading.add('url1')
+    assert app._tick_ms() == TUI.IDLE_TICK_MS
+    
+    app.searching = True
+    assert app._tick_ms() == TUI.BUSY_TICK_MS
+
+def test_tui_recommendations_during_search_reveal(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': 'Track 1', 'url': 'url1'}]
+    mock_streamer.search.return_value = [
+        {'title': f'Result {i}', 'url': f'res{i}'} for i in range(3)
+    ]
+    mock_streamer.get_recommendations.return_value = [{'title': 'Rec 1', 'url': 'rec1'}]
+    
+    app._search_thread("query")
+    assert app._shown_count() == 2  # Track 1 + first result
+    
+    # Recommendations land behind results that are still hidden
+    app._add_recommendations_thread(app.tracks[0])
+    assert [t['url'] for t in app.tracks] == ['url1', 'res0', 'res1', 'res2', 'rec1']
+    assert app._shown_count() == 2
+    
+    # Results keep appearing one at a time, then the recommendation
+    app._pending_reveals[0] = (0, app._pending_reveals[0][1])
+    app._reveal_due()
+    assert app._shown_count() == 3
+    assert app.selection_index == 2
+    assert app._tick_ms() == TUI.BUSY_TICK_MS
+    
+    app._pending_reveals[0] = (0, app._pending_reveals[0][1])
+    app._reveal_due()
+    assert app._shown_count() == 5
+    assert app.selection_index == 3
+    assert not any('_reveal_at' in t for t in app.tracks)
+
+def test_tui_layout_survives_list_shrinking_mid_frame(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': f'Track {i}', 'url': f'url{i}'} for i in range(3)]
+    full = app.tracks
+    # Count taken before another thread swapped in a shorter list
+    app._shown_count = lambda: len(full)
+    app.tracks = full[:1]
+    
+    rects, _ = app.layout_tracks()
+    assert [r['track']['url'] for r in rects] == ['url0']
+
+def test_tui_search_publishes_moved_results_at_once(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': t, 'url': t} for t in ('a', 'b', 'c')]
+    mock_streamer.search.return_value = [{'title': 'A', 'url': 'a'}, {'title': 'New', 'url': 'new'}]
+    snapshot = app.tracks
+    
+    app._search_thread("query")
+    
+    # A frame holding the old list never sees it half-moved
+    assert [t['url'] for t in snapshot] == ['a', 'b', 'c']
+    assert [t['url'] for t in app.tracks] == ['b', 'c', 'a', 'new']
+    assert app._by_url['a'] is app.tracks[2]
+    assert app.selection_index == 2
+
+def test_tui_like_saved_before_exit(mock_stdscr, mock_streamer):
+    app = TUI(mock_stdscr)
+    app.tracks = [{'title': 'Track 1', 'url': 'url1'}]
+    app.selection_index = 0
+    # A save worker that never gets to run before the process ends
+    app._save_pending = threading.Event()
+    
+    mock_stdscr.getch.side_effect = [ord('l'), -1, 27, -1] + [-1] * 10
+    app.run()
+    
+    mock_streamer.toggle_like.assert_called_once_with('url1', save=False)
+    mock_streamer._save_cache_metadata.assert_called_once()
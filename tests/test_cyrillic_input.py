@@ -48,6 +48,7 @@ def test_cyrillic_input():
             'play_count': 0, 'is_liked': False, 'is_disliked': False
         }
         instance._is_cached.return_value = False
+        instance.get_cached_urls.return_value = set()
         instance.format_duration.return_value = "3:30"
         
         # Mock search results
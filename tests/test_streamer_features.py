@@ -3,6 +3,9 @@ import sys
 import os
 import json
 import shutil
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from unittest.mock import patch
 
@@ -79,6 +82,174 @@ class TestStreamerFeatures(unittest.TestCase):
         self.assertFalse(self.streamer.get_track_stats(self.test_url)['is_liked'])
         self.assertFalse(self.streamer.get_track_stats(self.test_url)['is_disliked'])
 
+    def test_load_cache_metadata_interns_urls(self):
+        # Reload from disk: entries and their order survive, keys are interned
+        files = {f"https://www.youtube.com/watch?v=id{i}": {'title': f'T{i}'} for i in range(1000)}
+        self.streamer.cache_metadata['files'] = files
+        self.streamer._save_cache_metadata()
+
+        loaded = self.streamer._load_cache_metadata()
+        self.assertEqual(loaded['files'], files)
+        self.assertEqual(list(loaded['files']), list(files))
+        url = next(iter(loaded['files']))
+        self.assertIs(url, sys.intern("".join(["https://www.youtube.com/watch?v=", "id0"])))
+
+    def test_search_results_share_interned_urls(self):
+        url = "".join(["https://www.youtube.com/watch?v=", "mock123"])
+        mock_track = {'title': 'Mock', 'url': url, 'duration': 120, 'uploader': 'Mock'}
+        with patch.object(self.streamer, '_search_pwa', return_value=[mock_track]):
+            results = self.streamer.search("mock", max_results=1)
+
+        self.assertIs(results[0]['url'], sys.intern("https://www.youtube.com/watch?v=mock123"))
+
+    def test_cached_urls_index(self):
+        # Files present at startup are picked up by the initial scan
+        (self.test_cache_dir / "test.m4a").touch()
+        streamer = MusicStreamer(cache_dir=str(self.test_cache_dir))
+        other = "https://www.youtube.com/watch?v=other"
+        self.assertTrue(streamer._is_cached(self.test_url))
+        self.assertEqual(streamer.get_cached_urls([self.test_url, other]), {self.test_url})
+
+        # Downloads and deletes keep the index current
+        cache_path = streamer._get_cache_path(other)
+        cache_path.touch()
+        streamer._save_metadata_entry({'url': other, 'title': 'O', 'uploader': 'U', 'duration': 1},
+                                      cache_path, download_method="TEST")
+        self.assertTrue(streamer._is_cached(other))
+        streamer.delete_from_cache(self.test_url)
+        self.assertEqual(streamer.get_cached_urls([self.test_url, other]), {other})
+
+    def test_observe_mpv_properties(self):
+        sock_path = str(self.test_cache_dir / "mpv.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(sock_path)
+        server.listen(1)
+
+        def fake_mpv():
+            conn, _ = server.accept()
+            with conn:
+                conn.recv(4096)  # observe_property requests
+                conn.sendall(b'{"data":null,"error":"success"}\n'
+                             b'{"event":"property-change","id":1,"name":"time-pos","data":1.5}\n{"event":"prop')
+                conn.sendall(b'erty-change","id":2,"name":"pause","data":true}\n')
+
+        thread = threading.Thread(target=fake_mpv, daemon=True)
+        thread.start()
+        self.streamer.mpv_socket = sock_path
+        self.streamer.mpv_process = object()
+        try:
+            events = list(self.streamer._observe_mpv_properties(['time-pos', 'pause']))
+        finally:
+            self.streamer.mpv_process = None
+            server.close()
+        thread.join(1)
+
+        self.assertEqual(events, [('time-pos', 1.5), ('pause', True)])
+
+    def test_get_mpv_properties_single_request(self):
+        sock_path = str(self.test_cache_dir / "mpv.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(sock_path)
+        server.listen(1)
+        received = []
+
+        def fake_mpv():
+            conn, _ = server.accept()
+            with conn:
+                received.append(conn.recv(4096))
+                conn.sendall(b'{"request_id":1,"error":"property unavailable"}\n'
+                             b'{"event":"property-change","name":"pause"}\n'
+                             b'{"data":12.5,"request_id":0,"error":"success"}\n')
+
+        thread = threading.Thread(target=fake_mpv, daemon=True)
+        thread.start()
+        self.streamer.mpv_socket = sock_path
+        try:
+            state = self.streamer._get_mpv_properties(['time-pos', 'duration'])
+        finally:
+            server.close()
+        thread.join(1)
+
+        self.assertEqual(state, {'time-pos': 12.5, 'duration': None})
+        self.assertEqual(received[0].count(b"get_property"), 2)
+
+    def test_download_direct_segmented(self):
+        payload = bytes(range(256)) * 4099  # not a multiple of the segment count
+        ranges = []
+
+        class RangeHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                start, end = 0, len(payload) - 1
+                if 'Range' in self.headers:
+                    start, end = map(int, self.headers['Range'][len("bytes="):].split("-"))
+                    ranges.append((start, end))
+                    self.send_response(206)
+                else:
+                    self.send_response(200)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload[start:end + 1])
+                except OSError:
+                    pass  # first segment stops reading early
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.streamer.MIN_SEGMENTED_SIZE = 1024
+        path = self.test_cache_dir / "segmented.m4a"
+        try:
+            ok = self.streamer._download_direct(
+                f"http://127.0.0.1:{server.server_port}/track", path, show_progress=False)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertTrue(ok)
+        self.assertEqual(path.read_bytes(), payload)
+        self.assertEqual(len(ranges), self.streamer.DOWNLOAD_SEGMENTS - 1)
+
+    def test_prefetch_threshold_follows_download_speed(self):
+        # No measurement yet: fixed default
+        self.assertEqual(self.streamer._prefetch_threshold(200, 4_000_000),
+                         MusicStreamer.PRELOAD_PROGRESS)
+
+        # 4 MB at 1 MB/s is 2% of a 200 s track: start late
+        self.streamer._dl_bps = 1_000_000
+        fast = self.streamer._prefetch_threshold(200, 4_000_000)
+        self.assertAlmostEqual(fast, 1 - 0.02 - MusicStreamer.PRELOAD_SAFETY_MARGIN)
+
+        # 4 MB at 40 KB/s takes 100 s: clamped to the default
+        self.streamer._dl_bps = 40_000
+        self.assertEqual(self.streamer._prefetch_threshold(200, 4_000_000),
+                         MusicStreamer.PRELOAD_PROGRESS)
+
+    def test_resolved_streams_reused_by_download(self):
+        self.streamer.pwa_mode = True  # no yt-dlp fallback
+        self.streamer.playlist = [
+            {'title': f'T{i}', 'url': f"https://www.youtube.com/watch?v=next{i}", 'duration': 100}
+            for i in range(3)
+        ]
+        with patch.object(self.streamer, '_resolve_stream_pwa',
+                          side_effect=lambda vid: f"http://cdn/{vid}") as mock_resolve:
+            self.streamer._resolve_upcoming_streams(0)
+            self.streamer._resolve_upcoming_streams(0)  # still fresh: no new requests
+            self.assertEqual(mock_resolve.call_count, 2)
+
+            with patch.object(self.streamer, '_download_direct', return_value=False) as mock_direct:
+                self.streamer._download_to_cache(self.streamer.playlist[1], show_progress=False)
+                self.assertEqual(mock_direct.call_args[0][0], "http://cdn/next1")
+                self.assertEqual(mock_resolve.call_count, 2)
+
+                # Expired links are resolved again
+                self.streamer._resolved_streams['next2'] = ("http://cdn/stale", 0.0)
+                self.streamer._download_to_cache(self.streamer.playlist[2], show_progress=False)
+                self.assertEqual(mock_direct.call_args[0][0], "http://cdn/next2")
+                self.assertEqual(mock_resolve.call_count, 3)
+
     def test_search_structure(self):
         # Keep this unit test deterministic and independent of network/providers.
         mock_track = {
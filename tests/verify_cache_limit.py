@@ -3,6 +3,7 @@ import os
 import time
 import shutil
 import json
+from dataclasses import dataclass, field
 from pathlib import Path
 from datetime import datetime, timedelta
 import threading
@@ -17,17 +18,21 @@ if TEST_CACHE_DIR.exists():
 TEST_CACHE_DIR.mkdir()
 
 # Create a dummy class that mimics MusicStreamer enough for _enforce_cache_limit
+@dataclass(slots=True)
 class MockStreamer:
-    def __init__(self):
-        self.cache_dir = TEST_CACHE_DIR
-        self.config = {"max_cache_size_mb": 1} # 1 MB Limit for test
-        self.cache_metadata = {'files': {}}
-        self.playlist = []
-        self.current_index = 0
+    cache_dir: Path = TEST_CACHE_DIR
+    config: dict = field(default_factory=lambda: {"max_cache_size_mb": 1}) # 1 MB Limit for test
+    cache_metadata: dict = field(default_factory=lambda: {'files': {}})
+    playlist: list = field(default_factory=list)
+    current_index: int = 0
+    cache_meta_file: Path = field(init=False)
+
+    def __post_init__(self):
         self.cache_meta_file = self.cache_dir / "cache_metadata.json"
 
     def _save_cache_metadata(self):
-        with open(self.cache_meta_file, 'w') as f:
+        # Single 64 KB buffer: one write on close instead of many small ones
+        with open(self.cache_meta_file, 'w', buffering=65536) as f:
             json.dump(self.cache_metadata, f)
             
 import sys
@@ -47,6 +52,14 @@ def create_dummy_file(name, size_bytes, age_seconds=0):
 def test_cache_logic():
     print("🧪 Starting Cache Limit Verification")
     
+    # One clock read for all timestamps below
+    now = datetime.now()
+    fmt = "%Y-%m-%d %H:%M"
+    now_str = now.strftime(fmt)
+    half_hour_ago = (now - timedelta(minutes=30)).strftime(fmt)
+    hour_ago = (now - timedelta(hours=1)).strftime(fmt)
+    two_hours_ago = (now - timedelta(hours=2)).strftime(fmt)
+    
     streamer = MusicStreamer(cache_dir=str(TEST_CACHE_DIR))
     streamer.config["max_cache_size_mb"] = 5 # 5 MB Limit
     
@@ -62,9 +75,9 @@ def test_cache_logic():
     
     # Create metadata
     streamer.cache_metadata['files'] = {
-        'url_A': {'filename': 'fileA.m4a', 'downloaded_at': (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M"), 'url': 'url_A'},
-        'url_B': {'filename': 'fileB.m4a', 'downloaded_at': (datetime.now() - timedelta(minutes=30)).strftime("%Y-%m-%d %H:%M"), 'url': 'url_B'},
-        'url_C': {'filename': 'fileC.m4a', 'downloaded_at': datetime.now().strftime("%Y-%m-%d %H:%M"), 'url': 'url_C'},
+        'url_A': {'filename': 'fileA.m4a', 'downloaded_at': hour_ago, 'url': 'url_A'},
+        'url_B': {'filename': 'fileB.m4a', 'downloaded_at': half_hour_ago, 'url': 'url_B'},
+        'url_C': {'filename': 'fileC.m4a', 'downloaded_at': now_str, 'url': 'url_C'},
     }
     streamer._save_cache_metadata()
     
@@ -99,13 +112,13 @@ def test_cache_logic():
     streamer.cache_metadata['files'] = {
         'url_A': {
             'filename': 'fileA.m4a', 
-            'downloaded_at': (datetime.now() - timedelta(hours=2)).strftime("%Y-%m-%d %H:%M"), 
-            'last_played_at': datetime.now().strftime("%Y-%m-%d %H:%M"), # PLAYED NOW
+            'downloaded_at': two_hours_ago, 
+            'last_played_at': now_str, # PLAYED NOW
             'url': 'url_A'
         },
         'url_B': {
             'filename': 'fileB.m4a', 
-            'downloaded_at': (datetime.now() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M"),
+            'downloaded_at': hour_ago,
             'last_played_at': None,
             'url': 'url_B'
         }
@@ -19,7 +19,9 @@ KEYBOARD SHORTCUTS:
     d / - / /       - Dislike track
     Delete/Ctrl-X   - Remove track from list and cache
 """
+import bisect
 import curses
+import functools
 import locale
 import math
 import textwrap
@@ -27,30 +29,130 @@ from streamer import MusicStreamer
 import threading
 import time
 import sys
-import io
 import json # Used for manually checking mpv properties if needed
+import os
 import queue
-from contextlib import redirect_stdout, redirect_stderr
+import re
+import unicodedata
+from array import array
+from collections import deque
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
 
 # Set locale for unicode support
 locale.setlocale(locale.LC_ALL, '')
 
+# VTT cue timing: "[hh:]mm:ss.ttt --> [hh:]mm:ss.ttt" (cue settings may follow)
+_VTT_TIMING_RE = re.compile(
+    r'(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)\s+-->\s+(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)'
+)
+_VTT_BLOCK_SEP_RE = re.compile(r'\n[ \t]*\n')
+
+# Sink for streamer prints while curses owns the terminal
+_NULL = open(os.devnull, 'w')
+
+
+@contextmanager
+def _silence():
+    # Installed once around the whole session (see main): redirect_* swaps
+    # the process-wide sys.stdout, so per-call use from several threads
+    # restores streams out of order
+    with redirect_stdout(_NULL), redirect_stderr(_NULL):
+        yield
+
+
+# ncurses KEY_MAX: getch() values above it are characters, not special keys
+_KEY_CODE_MAX = 0o777
+
+# getch() bytes that can be text: everything but C0 controls and DEL
+# (128-255 are UTF-8 lead/continuation bytes)
+_PRINTABLE = bytearray(256)
+for _i in range(32, 256):
+    _PRINTABLE[_i] = _i != 127
+del _i
+
+
+@functools.lru_cache(maxsize=4096)
+def _char_cells(ch):
+    """Terminal cells taken by one character: 0 for combining/format, 2 for wide"""
+    if unicodedata.category(ch) in ('Mn', 'Me', 'Cf'):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+
+@functools.lru_cache(maxsize=1024)
+def _strip(ch, n):
+    """ch * n, shared between frames: rows built from it compare by identity"""
+    return ch * n
+
+
+def _cell_width(text):
+    if text.isascii():
+        return len(text)
+    return sum(map(_char_cells, text))
+
+
+def _fit_cells(text, width):
+    """Cut text to at most width cells and pad it to exactly width"""
+    if text.isascii():
+        return text[:width].ljust(width)
+    used = 0
+    for i, ch in enumerate(text):
+        cells = _char_cells(ch)
+        if used + cells > width:
+            return text[:i] + " " * (width - used)
+        used += cells
+    return text + " " * (width - used)
+
+
 class TUI:
+    # Row heights: every track is compact except the expanded one
+    TRACK_HEIGHT = 2
+    EXPANDED_HEIGHT = 6
+    
+    # Screen rows above and below the track list
+    HEADER_HEIGHT = 3
+    FOOTER_HEIGHT = 2
+    
+    # Max composed track lines kept between frames
+    LINE_CACHE_SIZE = 1024
+    
+    # getch timeouts: idle, playing (clock ticks), busy (spinner or reveal animates)
+    IDLE_TICK_MS = 1000
+    PLAYING_TICK_MS = 250
+    BUSY_TICK_MS = 100
+    
+    # Delay between search results appearing in the list
+    REVEAL_INTERVAL = 0.5
+    
+    # Download batches waiting for the cache worker; more are dropped, not queued
+    CACHE_QUEUE_SIZE = 32
+    # Tracks of one batch downloaded at the same time
+    CACHE_WORKERS = 3
+    # Failed downloads of a URL before it is no longer queued this session
+    CACHE_MAX_FAILURES = 3
+    
+    # Fetch recommendations this many tracks before the end of the playlist
+    PREFETCH_LOOKAHEAD = 2
+    
+    # mpv properties mirrored into self.mpv_state
+    OBSERVED_PROPS = ['time-pos', 'playlist-pos', 'pause', 'duration']
+
     def __init__(self, stdscr):
         self.stdscr = stdscr
         # Hide cursor initially
         curses.curs_set(0)
         self.stdscr.nodelay(True) # Non-blocking getch so we can update UI loop
-        self.stdscr.timeout(50) # Refresh every 50 ms (20 FPS)
+        self.stdscr.timeout(self.IDLE_TICK_MS) # Redraws are driven by self._dirty
         self.stdscr.keypad(True)
         
-        # Capture streamer output
-        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-            self.streamer = MusicStreamer()
+        self.streamer = MusicStreamer()
         
         self.logger = self.streamer.logger
         self.logger.info("TUI Initialized")
             
+        # Serializes list writers (UI, search and recommendation threads);
+        # readers take one snapshot of self.tracks instead
+        self._tracks_lock = threading.Lock()
         self.tracks = []  # Chronological list
         self.selection_index = -1 
         self.input_buffer = ""
@@ -58,14 +160,37 @@ class TUI:
         self.search_query = ""  # Current search query for display 
         
         # Load cache
-        self.cached_tracks = self._load_cached_tracks()
-        self.tracks.extend(self.cached_tracks)
+        self.tracks = self._load_cached_tracks()
         if self.tracks:
             self.selection_index = 0
         
         # Scroll offset
         self.scroll_y = 0
         
+        # Diff rendering: rows queued this frame vs rows on screen
+        # y -> [(x, text, attr), ...]
+        self._frame = {}
+        self._shadow = {}
+        self._cursor = None
+        self._screen_size = None
+        
+        # The track list lives on its own pad with its own frame/shadow
+        # (rows are relative to the top of the list area)
+        self._pad = None
+        self._list_frame = {}
+        self._list_shadow = {}
+        
+        # Composed track lines keyed by everything that affects them
+        self._line_cache = {}
+        
+        # Now-playing header text and what it was built from
+        self._header_key = None
+        self._header_text = ""
+        
+        # Set by keys and background threads when the screen is stale
+        self._dirty = threading.Event()
+        self._dirty.set()
+        
         # Colors
         curses.start_color()
         curses.use_default_colors()
@@ -91,131 +216,367 @@ class TUI:
         self.spinner_chars = ["|", "/", "-", "\\"]
         self.spinner_idx = 0
         
-        # Start MPV Monitor Thread
-        threading.Thread(target=self._mpv_monitor_thread, daemon=True).start()
-
         # Caching Worker
-        self.cache_queue = queue.Queue()
-        self.caching_now = set() # Set of URLs currently being cached
+        self.cache_queue = queue.Queue(maxsize=self.CACHE_QUEUE_SIZE)
+        # url -> 'queued' | 'downloading' | 'done' | 'failed'; written under _cache_lock
+        self._cache_status = {}
+        self._cache_failures = {}  # url -> failed download attempts
+        self._cache_lock = threading.Lock()
         threading.Thread(target=self._cache_worker, daemon=True).start()
         
         # Search state
         self.searching = False
+        # (reveal_at, track) for search results not shown yet, in list order;
+        # the UI loop reveals them. Everything from the first one on is hidden
+        self._pending_reveals = deque()
         
         # Recommendations state
         self.recommendations_added = False
+        # (playlist-pos, len(playlist)) of the last check that did not trigger
+        self._last_checked_pos = None
+        # (func, args) jobs for the long-lived background worker
+        self._bg_queue = queue.Queue()
+        threading.Thread(target=self._bg_worker, daemon=True).start()
+        # Likes and play counts change cache_metadata right away; the JSON
+        # rewrite is coalesced on its own thread so it never queues behind
+        # a network job on _bg_queue
+        self._save_pending = threading.Event()
+        self._saving = False  # the worker is writing right now
+        threading.Thread(target=self._save_worker, daemon=True).start()
         
         # Subtitle state
         self.expanded_index = -1
-        self.subtitle_cache = {} # url -> parsed_subs
+        self.subtitle_cache = {} # (path, mtime) -> (starts, ends, texts)
         self.subs_downloading = set() # urls
         
+        # Start MPV Monitor and spinner threads (last: they read the state above)
+        threading.Thread(target=self._mpv_monitor_thread, daemon=True).start()
+        threading.Thread(target=self._spinner_thread, daemon=True).start()
+        
+    @property
+    def input_buffer(self):
+        # Joined lazily: typing and pastes only append to _input_chars
+        if self._input_text is None:
+            self._input_text = "".join(self._input_chars)
+        return self._input_text
+
+    @input_buffer.setter
+    def input_buffer(self, text):
+        self._input_chars = list(text)
+        self._input_text = text
+
+    def _input_append(self, ch):
+        self._input_chars.append(ch)
+        self._input_text = None
+
+    def _input_extend(self, text):
+        self._input_chars.extend(text)
+        self._input_text = None
+
+    def _input_backspace(self):
+        if self._input_chars:
+            self._input_chars.pop()
+            self._input_text = None
+
+    @property
+    def tracks(self):
+        return self._tracks
+
+    @tracks.setter
+    def tracks(self, tracks):
+        # Every assignment rebuilds the url -> track index
+        self._tracks = tracks
+        self._by_url = {t['url']: t for t in tracks}
+
+    def _add_tracks(self, tracks):
+        """Append a batch in one list.extend, so the UI never sees half of it"""
+        with self._tracks_lock:
+            self._tracks.extend(tracks)
+            self._by_url.update((t['url'], t) for t in tracks)
+
+    def _append_moving(self, urls, tracks):
+        """Drop listed tracks whose URL is in urls and append tracks, published
+        as one new list; returns the index of the first appended track"""
+        with self._tracks_lock:
+            kept = [t for t in self._tracks if t['url'] not in urls] if urls else self._tracks
+            self.tracks = kept + tracks
+            return len(kept)
+
     def _mpv_monitor_thread(self):
-        """Background thread to poll MPV properties"""
+        """Background thread mirroring MPV properties pushed over IPC"""
+        while True:
+            if self.streamer.mpv_process:
+                # Blocks on the socket until mpv reports a change or goes away
+                for name, value in self.streamer._observe_mpv_properties(self.OBSERVED_PROPS):
+                    # Only what is visible on screen decides whether to redraw
+                    if name == 'time-pos':
+                        changed = self._whole_seconds(value) != self._whole_seconds(self.mpv_state['time-pos'])
+                    else:
+                        changed = value != self.mpv_state.get(name)
+                    self.mpv_state[name] = value
+                    if changed:
+                        self._dirty.set()
+            elif self.mpv_state['playlist-pos'] is not None:
+                self.mpv_state['time-pos'] = 0
+                self.mpv_state['playlist-pos'] = None
+                self._dirty.set()
+            # Waiting for mpv to start (or for its socket to appear)
+            time.sleep(0.1)
+
+    def _spinner_thread(self):
         while True:
             # Spinner animation tick (approx 10 FPS)
             self.spinner_idx = (self.spinner_idx + 1) % len(self.spinner_chars)
-            
-            try:
-                if self.streamer.mpv_process:
-                    # Batch fetch could be optimized but single calls are fine in bg thread
-                    self.mpv_state['time-pos'] = self.streamer._get_mpv_property('time-pos')
-                    self.mpv_state['playlist-pos'] = self.streamer._get_mpv_property('playlist-pos')
-                    # Could add more if needed
-                else:
-                    self.mpv_state['time-pos'] = 0
-                    self.mpv_state['playlist-pos'] = None
-            except:
-                pass
+            # The spinner is only drawn during a search; background downloads
+            # redraw once when they finish
+            if self.searching:
+                self._dirty.set()
             time.sleep(0.1)
 
+    @staticmethod
+    def _whole_seconds(val):
+        try:
+            return int(val)
+        except (TypeError, ValueError):
+            return None
+
+    def _tick_ms(self):
+        if self.searching or self._pending_reveals:
+            return self.BUSY_TICK_MS
+        if self.streamer.mpv_process:
+            return self.PLAYING_TICK_MS
+        return self.IDLE_TICK_MS
+
+    def _enqueue_cache(self, tracks):
+        """Queue background downloads as one batch, skipping URLs already queued/running"""
+        with self._cache_lock:
+            batch = [t for t in tracks
+                     if self._cache_status.get(t['url']) not in ('queued', 'downloading', 'failed')]
+            if not batch:
+                return
+            try:
+                self.cache_queue.put_nowait(batch)
+            except queue.Full:
+                self.logger.info(f"Cache queue full, not caching {len(batch)} tracks")
+                return
+            for t in batch:
+                self._cache_status[t['url']] = 'queued'
+
     def _cache_worker(self):
         while True:
+            batch = self.cache_queue.get()
             try:
-                track = self.cache_queue.get()
-                url = track['url']
-                
-                # Skip if already cached (double check)
-                if self.streamer._is_cached(url):
-                    track['is_cached'] = True
-                    self.cache_queue.task_done()
-                    continue
+                # Overlap the network waits of up to CACHE_WORKERS downloads;
+                # daemon threads, so quitting never waits for yt-dlp
+                for i in range(0, len(batch), self.CACHE_WORKERS):
+                    group = [threading.Thread(target=self._cache_track, args=(track,), daemon=True)
+                             for track in batch[i:i + self.CACHE_WORKERS]]
+                    for thread in group:
+                        thread.start()
+                    for thread in group:
+                        thread.join()
+            except Exception:
+                self.logger.exception("Cache worker error")
+            finally:
+                self.cache_queue.task_done()
+                self._dirty.set()
 
-                self.caching_now.add(url)
-                
-                # Perform download
-                # We suppress output here too
-                try:
-                    # using capture_output inside _download_to_cache but we can also use redirect
-                    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-                         success = self.streamer._download_to_cache(track, show_progress=False)
-                    
-                    if success:
-                        track['is_cached'] = True
-                        # Update metadata in streamer is done by _download_to_cache
-                except Exception:
-                    pass
-                finally:
-                    if url in self.caching_now:
-                        self.caching_now.remove(url)
-                    self.cache_queue.task_done()
-                    # Trigger refresh if possible? UI loop handles it.
-            except:
-                pass
+    def _bg_worker(self):
+        """Run one-off background jobs on a single long-lived thread"""
+        while True:
+            func, args = self._bg_queue.get()
+            try:
+                func(*args)
+            except Exception:
+                self.logger.exception("Background job error")
+            finally:
+                self._bg_queue.task_done()
+                self._dirty.set()
+
+    def _save_worker(self):
+        """Write cache metadata once per burst of _request_save calls"""
+        while True:
+            self._save_pending.wait()
+            self._saving = True
+            self._save_pending.clear()
+            try:
+                self.streamer._save_cache_metadata()
+            except Exception:
+                self.logger.exception("Metadata save failed")
+            finally:
+                self._saving = False
+
+    def _request_save(self):
+        self._save_pending.set()
+
+    def _cache_track(self, track):
+        url = track['url']
+        
+        # Skip if already cached (double check)
+        if self.streamer._is_cached(url):
+            track['is_cached'] = True
+            with self._cache_lock:
+                self._cache_status[url] = 'done'
+            return
+
+        with self._cache_lock:
+            self._cache_status[url] = 'downloading'
+        self._dirty.set()
+        success = False
+        
+        # Perform download
+        try:
+            success = self.streamer._download_to_cache(track, show_progress=False)
+            
+            if success:
+                track['is_cached'] = True
+                # Update metadata in streamer is done by _download_to_cache
+        except Exception:
+            self.logger.exception(f"Caching failed: {track.get('title')}")
+        finally:
+            with self._cache_lock:
+                if success:
+                    self._cache_status[url] = 'done'
+                    self._cache_failures.pop(url, None)
+                else:
+                    failures = self._cache_failures.get(url, 0) + 1
+                    self._cache_failures[url] = failures
+                    if failures >= self.CACHE_MAX_FAILURES:
+                        # Stop retrying a track that keeps failing
+                        self._cache_status[url] = 'failed'
+                        self.msg = f"Cache failed: {track.get('title', url)}"
+                    else:
+                        # A later search may queue it again
+                        self._cache_status.pop(url, None)
+            self._dirty.set()
 
     def _load_cached_tracks(self):
-        tracks = []
-        if 'files' in self.streamer.cache_metadata:
-            for url, data in self.streamer.cache_metadata['files'].items():
-                tracks.append({
-                    'title': data.get('title', 'Unknown'),
-                    'url': url,
-                    'duration': data.get('duration', 0) or 0,
-                    'is_cached': True,
-                    'subtitle_path': data.get('subtitle_path')
-                })
-        return tracks
+        # Rows are built straight from the already-parsed metadata: cheaper
+        # than loading any on-disk snapshot of them would be
+        files = self.streamer.cache_metadata.get('files', {})
+        return [
+            {
+                'title': data.get('title', 'Unknown'),
+                'url': url,
+                'duration': data.get('duration', 0) or 0,
+                'is_cached': True,
+                'subtitle_path': data.get('subtitle_path')
+            }
+            for url, data in files.items()
+        ]
 
     def _parse_vtt(self, path):
         subtitles = []
         try:
             with open(path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            current_start = 0
-            current_end = 0
-            current_text = []
-            
-            for line in lines:
-                line = line.strip()
-                if '-->' in line:
-                    parts = line.split(' --> ')
-                    current_start = self._vtt_to_seconds(parts[0])
-                    current_end = self._vtt_to_seconds(parts[1])
-                elif line == "" and current_text:
-                    subtitles.append({'start': current_start, 'end': current_end, 'text': " ".join(current_text)})
-                    current_text = []
-                elif line and not line.startswith('WEBVTT') and '-->' not in line:
-                    current_text.append(line)
-            if current_text:
-                subtitles.append({'start': current_start, 'end': current_end, 'text': " ".join(current_text)})
-        except: pass
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return subtitles
+        
+        # One cue per blank-line separated block; the header, NOTE and
+        # STYLE blocks have no timing line and are skipped
+        for block in _VTT_BLOCK_SEP_RE.split(content):
+            m = _VTT_TIMING_RE.search(block)
+            if not m:
+                continue
+            h1, m1, s1, h2, m2, s2 = m.groups()
+            # Text starts on the line after the timing (which may carry cue settings)
+            body = block[m.end():].partition('\n')[2]
+            text = " ".join(line.strip() for line in body.splitlines() if line.strip())
+            if not text:
+                continue
+            subtitles.append({
+                'start': int(h1 or 0) * 3600 + int(m1) * 60 + float(s1),
+                'end': int(h2 or 0) * 3600 + int(m2) * 60 + float(s2),
+                'text': text,
+            })
+        
         return subtitles
 
-    def _vtt_to_seconds(self, vtt_time):
+    def _subtitle_cues(self, path):
+        """Cue columns (starts, ends, texts) sorted by start, parsed once per (path, mtime)"""
         try:
-            parts = vtt_time.split(':')
-            if len(parts) == 3:
-                h, m, s = parts
-                return int(h)*3600 + int(m)*60 + float(s)
-            elif len(parts) == 2:
-                m, s = parts
-                return int(m)*60 + float(s)
-        except: pass
-        return 0
+            key = (str(path), os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        cues = self.subtitle_cache.get(key)
+        if cues is None:
+            subs = sorted(self._parse_vtt(path), key=lambda c: c['start'])
+            cues = (array('d', [c['start'] for c in subs]),
+                    array('d', [c['end'] for c in subs]),
+                    [c['text'] for c in subs])
+            self.subtitle_cache[key] = cues
+        return cues
+
+    def _active_cue(self, path, t):
+        """Text of the cue showing at t seconds, or None"""
+        cues = self._subtitle_cues(path)
+        if not cues:
+            return None
+        starts, ends, texts = cues
+        i = bisect.bisect_right(starts, t) - 1
+        if i >= 0 and ends[i] > t:
+            return texts[i]
+        return None
+
+    def _expanded(self):
+        """Index of the expanded track, or -1 if none (or stale)"""
+        if 0 <= self.expanded_index < len(self.tracks):
+            return self.expanded_index
+        return -1
+
+    def _index_from_end(self, track):
+        """Index of a track near the end of the list (identity), or -1"""
+        tracks = self.tracks
+        for i in range(len(tracks) - 1, -1, -1):
+            if tracks[i] is track:
+                return i
+        return -1
+
+    def _shown_count(self):
+        """Tracks visible in the list: those before the first unrevealed search result"""
+        if self._pending_reveals:
+            i = self._index_from_end(self._pending_reveals[0][1])
+            if i >= 0:
+                return i
+        return len(self.tracks)
+
+    def _reveal_due(self):
+        """Reveal search results whose time has come and move the selection to them"""
+        pending = self._pending_reveals
+        if not pending:
+            return
+        now = time.monotonic()
+        revealed = None
+        while pending and pending[0][0] <= now:
+            revealed = pending.popleft()[1]
+        if revealed is not None:
+            i = self._index_from_end(revealed)
+            if i >= 0:
+                self.selection_index = i
+            self._dirty.set()
+
+    def _track_y(self, index):
+        """Document Y of a track (0-based) in O(1): only one row can be taller"""
+        y = index * self.TRACK_HEIGHT
+        if 0 <= self._expanded() < index:
+            y += self.EXPANDED_HEIGHT - self.TRACK_HEIGHT
+        return y
+
+    def _track_at(self, y):
+        """Index of the track covering document row y (inverse of _track_y)"""
+        expanded = self._expanded()
+        if expanded >= 0:
+            expanded_y = expanded * self.TRACK_HEIGHT
+            if y >= expanded_y + self.EXPANDED_HEIGHT:
+                return expanded + 1 + (y - expanded_y - self.EXPANDED_HEIGHT) // self.TRACK_HEIGHT
+            if y >= expanded_y:
+                return expanded
+        return max(0, y) // self.TRACK_HEIGHT
 
     def layout_tracks(self):
-        # Optimized Virtual Scrolling with Dynamic Heights
+        # Virtual scrolling: jump straight to the first visible track and
+        # walk only the rows inside the view window
         rects = []
         max_y, max_x = self.stdscr.getmaxyx()
         
@@ -223,47 +584,42 @@ class TUI:
         header_height = 3
         footer_height = 2
         view_height = max_y - header_height - footer_height
+        view_end = self.scroll_y + view_height
         
-        current_y = 0 # Logical Y position (0-based)
-        
-        for i, track in enumerate(self.tracks):
-             height = 2 # Compact default height
-             if i == self.expanded_index:
-                 height = 6 # Expanded height
-             
-             # Visibility Check: Does track overlap with view window?
-             # Window is [scroll_y, scroll_y + view_height]
-             if current_y + height > self.scroll_y and current_y < self.scroll_y + view_height:
-                  rects.append({
-                    'abs_y': current_y,
-                    'height': height,
-                    'track': track,
-                    'index': i
-                  })
-             current_y += height
-             
-        return rects, current_y
+        # One snapshot for the whole frame: the search thread may swap in a
+        # shorter list while we walk it
+        tracks = self.tracks
+        count = min(self._shown_count(), len(tracks))
+        i = self._track_at(self.scroll_y)
+        current_y = self._track_y(i)
+        while i < count and current_y < view_end:
+            height = self.EXPANDED_HEIGHT if i == self.expanded_index else self.TRACK_HEIGHT
+            rects.append({
+                'abs_y': current_y,
+                'height': height,
+                'track': tracks[i],
+                'index': i
+            })
+            current_y += height
+            i += 1
+        
+        return rects, self._track_y(count)
 
     def get_progress(self):
-        try:
-            val = self.mpv_state.get('time-pos')
-            if val is not None:
-                return float(val)
-        except:
-            pass
-        return 0
+        val = self.mpv_state.get('time-pos')
+        return float(val) if isinstance(val, (int, float)) else 0
 
     def draw_header(self):
         max_y, max_x = self.stdscr.getmaxyx()
         
         # Draw background band
         header_bg = curses.color_pair(1) | curses.A_BOLD
-        self.stdscr.addstr(0, 0, " " * max_x, header_bg)
-        self.stdscr.addstr(1, 0, " " * max_x, header_bg)
+        self._put(0, 0, _strip(" ", max_x), header_bg)
+        self._put(1, 0, _strip(" ", max_x), header_bg)
         
         # App Title
         title = " 🎵 OnlyMusic "
-        self.stdscr.addstr(0, 0, title, header_bg)
+        self._put(0, 0, title, header_bg)
         
         # Now Playing info
         if self.streamer.mpv_process and self.streamer.playlist:
@@ -271,25 +627,29 @@ class TUI:
             curr_title = current.get('title', 'Unknown')
             status = "⏸" if self.mpv_state.get('pause') else "▶"
             
-            # Progress
-            curr_time = self.get_progress()
-            dur = current.get('duration', 0)
-            if isinstance(dur, str): dur = self.streamer._parse_duration(dur)
+            # Progress: the text only changes once per second of playback
+            curr_time = int(self.get_progress())
+            dur = self._track_duration(current)
             
-            time_str = f"{self.streamer.format_duration(curr_time)} / {self.streamer.format_duration(dur)}"
-            
-            np_text = f" {status} {curr_title}  [{time_str}] "
-            if len(np_text) > max_x - len(title):
-                np_text = np_text[:max_x - len(title) - 4] + "... ] "
+            key = (status, curr_title, curr_time, dur, max_x)
+            if key != self._header_key:
+                time_str = f"{self.streamer.format_duration(curr_time)} / {self.streamer.format_duration(dur)}"
+                
+                np_text = f" {status} {curr_title}  [{time_str}] "
+                if len(np_text) > max_x - len(title):
+                    np_text = np_text[:max_x - len(title) - 4] + "... ] "
+                self._header_key = key
+                self._header_text = np_text
+            np_text = self._header_text
             
-            self.stdscr.addstr(0, max_x - len(np_text), np_text, header_bg)
+            self._put(0, max_x - len(np_text), np_text, header_bg)
             
             # Status line (Line 2) - maybe volume or next track?
             # self.stdscr.addstr(1, 0, " Next: ... ", header_bg)
         
-        self.stdscr.addstr(2, 0, "─" * max_x, curses.A_DIM)
+        self._put(2, 0, _strip("─", max_x), curses.A_DIM)
 
-    def draw_track(self, rect, is_selected):
+    def draw_track(self, rect, is_selected, stats=None):
         # Coordinates are already screen-relative from layout_tracks logic adjustment needed
         # Wait, in layout_tracks I did 'y': current_y - self.scroll_y. 
         # But rect['y'] in layout_tracks was set to relative screen pos?
@@ -321,9 +681,11 @@ class TUI:
             return
 
         track = rect['track']
-        stats = self.streamer.get_track_stats(track['url'])
+        if stats is None:
+            stats = self.streamer.get_track_stats(track['url'])
         is_playing = (self.streamer.mpv_process and self.streamer.playlist and 
                       self.streamer.playlist[0]['url'] == track['url'])
+        dur_val = self._track_duration(track)
 
         # Color/Style Logic
         # 1. Selected: Blue Background (Pair 1)
@@ -365,49 +727,28 @@ class TUI:
             elif track.get('is_duplicate'): icon = "↻"
             elif track.get('is_cached'): icon = "✓"
             
-            # 2. Source
-            source = track.get('search_method', 'YT')
-            
-            # 3. Title
+            # 2. Title
             title = track.get('title', 'Unknown')
-            
-            # 4. Meta (Duration, Plays) - Adaptive
-            dur_val = track.get('duration', 0)
-            if isinstance(dur_val, str): dur_val = self.streamer._parse_duration(dur_val)
-            dur_str = self.streamer.format_duration(dur_val)
-            
             play_count = stats.get('play_count', 0)
-            plays_str = f"{play_count}▶" if play_count > 0 else ""
             
-            # Adaptive Construction
-            # Small Screen: Icon | Title | Dur
-            # Wide Screen: Icon | Source | Title | Plays | Dur
-            
-            # Fixed widths
-            icon_w = 3
-            time_w = 8
-            
-            right_text = f"{dur_str}"
-            if max_x > 80: # Wide
-                right_text = f" {plays_str}  {dur_str} "
-            
-            avail_title_w = w - icon_w - len(right_text)
-            if avail_title_w < 10: avail_title_w = 10
-            
-            title_fmt = title[:avail_title_w]
-            
-            line_str = f" {icon:<2}{title_fmt:<{avail_title_w}}{right_text:>8}"
+            # The composed line only depends on these; reuse it across frames
+            key = (icon, title, dur_val, play_count, max_x)
+            cached = self._line_cache.get(key)
+            if cached is None:
+                line_str = self._compose_track_line(icon, title, dur_val, play_count, w, max_x)
+                cached = (line_str, _cell_width(line_str))
+                if len(self._line_cache) >= self.LINE_CACHE_SIZE:
+                    del self._line_cache[next(iter(self._line_cache))]
+                self._line_cache[key] = cached
+            line_str, drawn_len = cached
             
             # Draw with padding
-            try:
-                self.stdscr.addstr(y, h_padding, line_str, style)
-                
-                # Fill rest of background if selected
-                drawn_len = len(line_str)
-                rem_len = w - drawn_len
-                if is_selected and rem_len > 0:
-                    self.stdscr.addstr(y, h_padding + drawn_len, " " * rem_len, style)
-            except: pass
+            self._put_list(y, h_padding, line_str, style)
+            
+            # Fill rest of background if selected
+            rem_len = w - drawn_len
+            if is_selected and rem_len > 0:
+                self._put_list(y, h_padding + drawn_len, _strip(" ", rem_len), style)
 
         # Line 2: Progress (if playing) or secondary spacer
         if 0 <= y + 1 < max_y - 1:
@@ -416,18 +757,16 @@ class TUI:
                 bar_width = w
                 
                 # Draw Bar Background
-                try:
-                    self.stdscr.addstr(bar_y, h_padding, "─" * bar_width, style | curses.A_DIM)
+                self._put_list(bar_y, h_padding, _strip("─", bar_width), style | curses.A_DIM)
+                
+                if is_playing:
+                    progress = 0
+                    if dur_val and dur_val > 0:
+                        progress = self.get_progress() / dur_val
+                    filled = int(bar_width * min(progress, 1))
                     
-                    if is_playing:
-                        progress = 0
-                        if dur_val > 0:
-                            progress = self.get_progress() / dur_val
-                        filled = int(bar_width * min(progress, 1))
-                        
-                        if filled > 0:
-                            self.stdscr.addstr(bar_y, h_padding, "━" * filled, style | curses.A_BOLD)
-                except: pass
+                    if filled > 0:
+                        self._put_list(bar_y, h_padding, _strip("━", filled), style | curses.A_BOLD)
             else:
                 # Vertical Rhythm / Separator
                 # Just a blank line or a very subtle dot?
@@ -437,9 +776,48 @@ class TUI:
 
         # Expanded View
         if rect['height'] > 2 and 0 <= y + 2 < max_y - 1:
-             try:
-                 self.stdscr.addstr(y+2, h_padding + 2, "Detailed info / Subtitles would go here...", curses.A_DIM)
-             except: pass
+            cue = None
+            if is_playing and track.get('subtitle_path'):
+                cue = self._active_cue(track['subtitle_path'], self.get_progress())
+            if cue:
+                # Current subtitle, wrapped over the expanded rows
+                lines = textwrap.wrap(cue, max(10, w - 4))[:self.EXPANDED_HEIGHT - 3]
+                for i, line in enumerate(lines):
+                    self._put_list(y + 2 + i, h_padding + 2, line, curses.A_NORMAL)
+            else:
+                self._put_list(y+2, h_padding + 2, "Detailed info / Subtitles would go here...", curses.A_DIM)
+
+    def _track_duration(self, track):
+        """Duration in seconds, parsed once per track and memoized on it"""
+        if '_dur_s' not in track:
+            dur_val = track.get('duration', 0)
+            if isinstance(dur_val, str): dur_val = self.streamer._parse_duration(dur_val)
+            track['_dur_s'] = dur_val
+        return track['_dur_s']
+
+    def _compose_track_line(self, icon, title, dur_val, play_count, w, max_x):
+        # Meta (Duration, Plays) - Adaptive
+        dur_str = self.streamer.format_duration(dur_val)
+        plays_str = f"{play_count}▶" if play_count > 0 else ""
+        
+        # Adaptive Construction
+        # Small Screen: Icon | Title | Dur
+        # Wide Screen: Icon | Title | Plays | Dur
+        
+        # Fixed widths
+        icon_w = 3
+        
+        right_text = f"{dur_str}"
+        if max_x > 80: # Wide
+            right_text = f" {plays_str}  {dur_str} "
+        
+        avail_title_w = w - icon_w - len(right_text)
+        if avail_title_w < 10: avail_title_w = 10
+        
+        # Measured in cells, not code points: CJK and emoji are two wide
+        title_fmt = _fit_cells(title, avail_title_w)
+        
+        return f" {icon:<2}{title_fmt}{right_text:>8}"
 
     def _download_subs_worker(self, track):
         try:
@@ -451,6 +829,7 @@ class TUI:
         finally:
             if track['url'] in self.subs_downloading:
                 self.subs_downloading.remove(track['url'])
+            self._dirty.set()
 
     def draw_input(self):
         max_y, max_x = self.stdscr.getmaxyx()
@@ -458,65 +837,110 @@ class TUI:
         help_y = max_y - 2
         h_padding = 2
         
-        try:
-            # Contextual Help
-            if self.searching or (self.input_buffer and len(self.input_buffer) > 0):
-                # Search Mode
-                help_text = "Enter:Search  Esc:Cancel"
-            else:
-                # Navigation Mode
-                help_text = "↑/↓:Nav  Tab:Play  Space:Type  Ent:Play/Pause  l:Like  d:Dislike  ^X:Del"
-            
-            self.stdscr.move(help_y, 0)
-            self.stdscr.clrtoeol()
-            self.stdscr.addstr(help_y, h_padding, help_text[:max_x-h_padding*2], curses.A_DIM)
-            
-            # Input Area
-            self.stdscr.move(input_y, 0)
-            self.stdscr.clrtoeol()
-            
-            # Color change for search prompt when active
-            prompt_style = curses.A_BOLD
-            if self.searching:
-                 prompt_style = curses.color_pair(4) | curses.A_BOLD # Yellow
-            
-            prompt = "Search: "
-            self.stdscr.addstr(input_y, h_padding, prompt, prompt_style)
-            
-            # Input buffer with search indicator
-            display_text = self.input_buffer
-            if self.searching and self.search_query:
-                # When searching, show query clearly
-                display_text = f"{self.search_query}" 
-            
-            self.stdscr.addstr(input_y, h_padding + len(prompt), display_text, curses.color_pair(2))
-            
-            # Spinner next to input if searching?
-            if self.searching:
-                 spinner = self.spinner_chars[self.spinner_idx]
-                 self.stdscr.addstr(input_y, h_padding + len(prompt) + len(display_text) + 1, spinner, curses.color_pair(4))
-
-            # Flash Message
-            if self.msg:
-                 msg_x = max_x - len(self.msg) - h_padding
-                 if msg_x > h_padding + len(prompt) + len(display_text) + 4:
-                     self.stdscr.addstr(input_y, msg_x, self.msg)
-            
-            curses.curs_set(1)
-            self.stdscr.move(input_y, h_padding + len(prompt) + len(self.input_buffer))
+        # Contextual Help
+        if self.searching or (self.input_buffer and len(self.input_buffer) > 0):
+            # Search Mode
+            help_text = "Enter:Search  Esc:Cancel"
+        else:
+            # Navigation Mode
+            help_text = "↑/↓:Nav  Tab:Play  Space:Type  Ent:Play/Pause  l:Like  d:Dislike  ^X:Del"
+        
+        self._put(help_y, h_padding, help_text[:max_x-h_padding*2], curses.A_DIM)
+        
+        # Color change for search prompt when active
+        prompt_style = curses.A_BOLD
+        if self.searching:
+             prompt_style = curses.color_pair(4) | curses.A_BOLD # Yellow
+        
+        prompt = "Search: "
+        self._put(input_y, h_padding, prompt, prompt_style)
+        
+        # Input buffer with search indicator
+        display_text = self.input_buffer
+        if self.searching and self.search_query:
+            # When searching, show query clearly
+            display_text = f"{self.search_query}" 
+        
+        self._put(input_y, h_padding + len(prompt), display_text, curses.color_pair(2))
+        
+        # Spinner next to input if searching?
+        if self.searching:
+             spinner = self.spinner_chars[self.spinner_idx]
+             self._put(input_y, h_padding + len(prompt) + len(display_text) + 1, spinner, curses.color_pair(4))
 
-        except curses.error:
-            pass
+        # Flash Message
+        if self.msg:
+             msg_x = max_x - len(self.msg) - h_padding
+             if msg_x > h_padding + len(prompt) + len(display_text) + 4:
+                 self._put(input_y, msg_x, self.msg, curses.A_NORMAL)
+        
+        self._cursor = (input_y, h_padding + len(prompt) + len(self.input_buffer))
+
+    def _put(self, y, x, text, attr):
+        """Queue text for this frame; _present() only touches rows that changed"""
+        self._frame.setdefault(y, []).append((x, text, attr))
+
+    def _put_list(self, y, x, text, attr):
+        """Like _put, but onto the track list pad (y is still a screen row)"""
+        self._list_frame.setdefault(y - self.HEADER_HEIGHT, []).append((x, text, attr))
+
+    def _flush(self, win, frame, shadow, rows):
+        """Rewrite the rows of win where frame differs from shadow"""
+        for y in shadow.keys() | frame.keys():
+            if not 0 <= y < rows:
+                continue  # Clipped by the window
+            row = frame.get(y)
+            if row == shadow.get(y):
+                continue
+            try:
+                win.move(y, 0)
+                win.clrtoeol()
+            except curses.error:
+                continue
+            for x, text, attr in row or ():
+                try:
+                    win.addstr(y, x, text, attr)
+                except curses.error:
+                    pass  # Bottom-right cell / clipped text
+
+    def _present(self):
+        """Emit rows that differ from the previous frame, then one doupdate()"""
+        size = self.stdscr.getmaxyx()
+        max_y, max_x = size
+        list_rows = max(1, max_y - self.HEADER_HEIGHT - self.FOOTER_HEIGHT)
+        if size != self._screen_size:
+            # Resize: whatever is on screen is stale
+            self._screen_size = size
+            self._shadow = {}
+            self._list_shadow = {}
+            self.stdscr.erase()
+            self._pad = curses.newpad(list_rows, max(1, max_x))
+        
+        self._flush(self.stdscr, self._frame, self._shadow, max_y)
+        self._flush(self._pad, self._list_frame, self._list_shadow, list_rows)
+        self._shadow, self._frame = self._frame, {}
+        self._list_shadow, self._list_frame = self._list_frame, {}
+        
+        # Header/footer first, then the list pad over the middle of the screen
+        self.stdscr.noutrefresh()
+        self._pad.noutrefresh(0, 0, self.HEADER_HEIGHT, 0,
+                              self.HEADER_HEIGHT + list_rows - 1, max_x - 1)
+        
+        if self._cursor:
+            try:
+                curses.curs_set(1)
+                self.stdscr.move(*self._cursor)
+            except curses.error:
+                pass
+        # Nothing left to copy from stdscr: this only places the cursor
+        self.stdscr.noutrefresh()
+        curses.doupdate()
 
     def ensure_visible(self, index, rects=None):
         if index < 0 or index >= len(self.tracks): return
         
-        # Calculate target_y by summing heights of all preceding tracks
-        target_y = 0
-        for i in range(index):
-            target_y += 6 if i == self.expanded_index else 2
-        
-        target_h = 6 if index == self.expanded_index else 2
+        target_y = self._track_y(index)
+        target_h = self.EXPANDED_HEIGHT if index == self.expanded_index else self.TRACK_HEIGHT
         
         max_y, max_x = self.stdscr.getmaxyx()
         header_height = 3
@@ -530,126 +954,203 @@ class TUI:
 
     def run(self):
         while True:
-            self.stdscr.erase()
-            
-            self.draw_header()
-            
-            rects, total_height = self.layout_tracks()
-            
             # Проверяем, играет ли последний трек и нужно ли добавить рекомендации
             self._check_and_add_recommendations()
+            self._reveal_due()
             
-            # Draw Tracks
-            for rect in rects:
-                is_selected = (rect['index'] == self.selection_index)
-                self.draw_track(rect, is_selected)
-            
-            # Update scroll position after search completes
-            if self.selection_index >= 0 and self.tracks:
-                self.ensure_visible(self.selection_index)
-            
-            self.draw_input()
-            
-            self.stdscr.refresh()
+            # Repaint only when a key or a background thread changed something
+            if self._dirty.is_set():
+                self._dirty.clear()
+                
+                # Update scroll position after search completes
+                # (before layout: this frame may be the only one drawn)
+                if self.selection_index >= 0 and self.tracks:
+                    self.ensure_visible(self.selection_index)
+                
+                self.draw_header()
+                
+                rects, total_height = self.layout_tracks()
+                
+                # Stats for the visible tracks, fetched once per URL per frame
+                stats_map = {}
+                for rect in rects:
+                    url = rect['track']['url']
+                    if url not in stats_map:
+                        stats_map[url] = self.streamer.get_track_stats(url)
+                
+                # Draw Tracks
+                for rect in rects:
+                    is_selected = (rect['index'] == self.selection_index)
+                    self.draw_track(rect, is_selected, stats_map[rect['track']['url']])
+                
+                self.draw_input()
+                
+                self._present()
             
+            self.stdscr.timeout(self._tick_ms())
             key = self.stdscr.getch()
-            self.msg = "" # Flash message only lasts until next key/refresh?
-            
+            # Messages from background threads arrive while getch() waits:
+            # a timeout must not wipe them before the next frame shows them
             if key == -1:
                 continue
+            had_msg = bool(self.msg)
+            self.msg = "" # Flash message lasts until the next key
 
             # Check if this is a single key press or part of a burst (paste)
-            next_key = self.stdscr.getch()
-            is_single = (next_key == -1)
-            if not is_single:
-                # Put it back or process as sequence
-                keys = [key, next_key]
-                while True:
-                    nk = self.stdscr.getch()
-                    if nk == -1: break
-                    keys.append(nk)
-                
-                # If it's a burst, we treat all as text input for search
-                for k in keys:
-                    try:
-                        # Accept any valid character, not just ASCII
-                        if k >= 32 and k != 127:  # Exclude control chars and DEL
-                            self.input_buffer += chr(k)
-                    except (ValueError, OverflowError):
-                        pass
+            # Don't wait for more input: whatever was pasted is already buffered
+            self.stdscr.timeout(0)
+            keys = [key]
+            while (nk := self.stdscr.getch()) != -1:
+                keys.append(nk)
+            if len(keys) > 1:
+                self._dirty.set()
+                self._handle_burst(keys)
                 continue
 
-            # Process Single Key Commands
-            if key == 10: # Enter
-                if self.input_buffer.strip():
-                    self.logger.info(f"User search trigger: {self.input_buffer.strip()}")
-                    self.perform_search()
-                else:
-                    self.logger.info("User play/pause toggle")
-                    self.toggle_play()
-            
-            elif key in (curses.KEY_BACKSPACE, 127, 8):
-                self.input_buffer = self.input_buffer[:-1]
-                
-            elif key == curses.KEY_UP:
-                if self.selection_index > 0:
-                    self.selection_index -= 1
-                    self.ensure_visible(self.selection_index)
-            elif key == curses.KEY_DOWN:
-                if self.selection_index < len(self.tracks) - 1:
-                    self.selection_index += 1
-                    self.ensure_visible(self.selection_index)
-
-            elif key == curses.KEY_LEFT:
-                 self.streamer._send_mpv_command(["seek", "-5", "relative"])
-            elif key == curses.KEY_RIGHT:
-                 self.streamer._send_mpv_command(["seek", "5", "relative"])
-            
-            elif key == ord('\t'): 
-                 self.logger.info(f"User play track: {self.selection_index}")
-                 self.play_current()
+            prev_selection, prev_scroll = self.selection_index, self.scroll_y
+            if not self._handle_key(key):
+                break
             
-            elif key == ord('#'):
-                if self.expanded_index == self.selection_index:
-                    self.expanded_index = -1
-                else:
-                    self.expanded_index = self.selection_index
-                self.ensure_visible(self.selection_index)
-            
-            elif key == curses.KEY_DC or key == 330 or key == 24: # Delete or Ctrl-X
-                self.delete_current()
-
-            elif key in (ord('+'), ord('*'), ord('l')):
-                if 0 <= self.selection_index < len(self.tracks):
-                    track = self.tracks[self.selection_index]
-                    self.logger.info(f"User like track: {track['title']}")
-                    self.streamer.toggle_like(track['url'])
-
-            elif key in (ord('/'), ord('-'), ord('d')):
-                if 0 <= self.selection_index < len(self.tracks):
-                    track = self.tracks[self.selection_index]
-                    self.logger.info(f"User dislike track: {track['title']}")
-                    self.streamer.toggle_dislike(track['url'])
-
-            elif key == 27: # Esc
-                if self.input_buffer:
-                    self.input_buffer = ""
-                else:
-                    break
-            
-            elif key >= 32 and key != 127:  # Printable characters including Unicode
-                try:
-                    self.input_buffer += chr(key)
-                except (ValueError, OverflowError):
-                    pass  # Ignore invalid characters
+            # Moving the selection within the view only restyles two tracks
+            if (key in (curses.KEY_UP, curses.KEY_DOWN) and not had_msg
+                    and self.scroll_y == prev_scroll and not self._dirty.is_set()
+                    and self.stdscr.getmaxyx() == self._screen_size):
+                if self.selection_index != prev_selection:
+                    self._redraw_selection(prev_selection, self.selection_index)
+                continue
+            self._dirty.set()
                 
             # If user types, we might want to auto-scroll to bottom if we were searching?
             # User said "Search query at very bottom".
             # The list grows down.
 
+        # The save worker is a daemon and dies with the process: write what
+        # it has not saved yet (a save in progress may be cut off, so redo it;
+        # the metadata lock waits for its dump to finish)
+        if self._save_pending.is_set() or self._saving:
+            self._save_pending.clear()
+            self.streamer._save_cache_metadata()
+
         if self.streamer.mpv_process:
             self.streamer._fade_out_and_stop()
 
+    def _redraw_selection(self, old, new):
+        """Repaint just the tracks whose selection state changed"""
+        # Start from what is on screen; header and footer stay as they are
+        self._frame = dict(self._shadow)
+        self._list_frame = dict(self._list_shadow)
+        
+        rects = [r for r in self.layout_tracks()[0] if r['index'] in (old, new)]
+        for rect in rects:
+            top = self.HEADER_HEIGHT + rect['abs_y'] - self.scroll_y
+            for y in range(top, top + rect['height']):
+                self._list_frame.pop(y - self.HEADER_HEIGHT, None)
+        for rect in rects:
+            self.draw_track(rect, rect['index'] == new)
+        
+        self._present()
+
+    def _handle_key(self, key):
+        """Dispatch one key; returns False when the app should exit"""
+        if key == 10: # Enter
+            if self.input_buffer.strip():
+                self.logger.info(f"User search trigger: {self.input_buffer.strip()}")
+                self.perform_search()
+            else:
+                self.logger.info("User play/pause toggle")
+                self.toggle_play()
+
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            self._input_backspace()
+
+        elif key == curses.KEY_UP:
+            if self.selection_index > 0:
+                self.selection_index -= 1
+                self.ensure_visible(self.selection_index)
+        elif key == curses.KEY_DOWN:
+            if self.selection_index < self._shown_count() - 1:
+                self.selection_index += 1
+                self.ensure_visible(self.selection_index)
+
+        elif key == curses.KEY_LEFT:
+             self.streamer._send_mpv_command(["seek", "-5", "relative"])
+        elif key == curses.KEY_RIGHT:
+             self.streamer._send_mpv_command(["seek", "5", "relative"])
+
+        elif key == ord('\t'): 
+             self.logger.info(f"User play track: {self.selection_index}")
+             self.play_current()
+
+        elif key == ord('#'):
+            if self.expanded_index == self.selection_index:
+                self.expanded_index = -1
+            else:
+                self.expanded_index = self.selection_index
+            self.ensure_visible(self.selection_index)
+
+        elif key == curses.KEY_DC or key == 330 or key == 24: # Delete or Ctrl-X
+            self.delete_current()
+
+        elif key in (ord('+'), ord('*'), ord('l')):
+            if 0 <= self.selection_index < len(self.tracks):
+                track = self.tracks[self.selection_index]
+                self.logger.info(f"User like track: {track['title']}")
+                # Saving metadata rewrites the whole JSON; keep it off the key path
+                self.streamer.toggle_like(track['url'], save=False)
+                self._request_save()
+
+        elif key in (ord('/'), ord('-'), ord('d')):
+            if 0 <= self.selection_index < len(self.tracks):
+                track = self.tracks[self.selection_index]
+                self.logger.info(f"User dislike track: {track['title']}")
+                self.streamer.toggle_dislike(track['url'], save=False)
+                self._request_save()
+
+        elif key == 27: # Esc
+            if self.input_buffer:
+                self.input_buffer = ""
+            else:
+                return False
+
+        elif self._is_text_key(key):  # Printable characters including Unicode
+            self._input_append(chr(key))
+        return True
+
+    @staticmethod
+    def _is_text_key(key):
+        if 0 <= key < 256:
+            return bool(_PRINTABLE[key])
+        return _KEY_CODE_MAX < key <= sys.maxunicode and chr(key).isprintable()
+
+    @staticmethod
+    def _is_key_code(key):
+        """curses KEY_* codes (arrows, Home, resize...) rather than characters"""
+        return 256 <= key <= _KEY_CODE_MAX
+
+    def _handle_burst(self, keys):
+        """Pasted/buffered input: text goes to the search field in one go.
+        
+        Runs of raw bytes are decoded as UTF-8 together (a multibyte character
+        arrives as several getch() values). Special keys caught in the burst
+        (arrows etc.) are dispatched normally; control characters are dropped
+        so a pasted newline or Esc doesn't search or quit.
+        """
+        chunk = bytearray()
+        for k in keys:
+            if 0 <= k < 256 and _PRINTABLE[k]:
+                chunk.append(k)
+                continue
+            if chunk:
+                self._input_extend(chunk.decode('utf-8', 'ignore'))
+                chunk.clear()
+            if self._is_key_code(k):
+                self._handle_key(k)
+            elif self._is_text_key(k):
+                # Already a code point (wide-character input)
+                self._input_append(chr(k))
+        if chunk:
+            self._input_extend(chunk.decode('utf-8', 'ignore'))
+
     def perform_search(self):
         query = self.input_buffer.strip()
         if not query: return
@@ -666,13 +1167,12 @@ class TUI:
         threading.Thread(target=self._search_thread, args=(query,), daemon=True).start()
     
     def _search_thread(self, query):
-        existing_map = {t['url']: t for t in self.tracks}
         seen_urls_in_search = set()
+        moved_urls = set()
         
         try:
-            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-                # Fetch fewer results for faster search
-                results = self.streamer.search(query, max_results=5)
+            # Fetch fewer results for faster search
+            results = self.streamer.search(query, max_results=5)
             
             if results:
                 tracks_to_process = []
@@ -684,11 +1184,12 @@ class TUI:
                         continue
                     seen_urls_in_search.add(url)
                     
-                    if url in existing_map:
+                    dup_track = self._by_url.get(url)
+                    if dup_track is not None:
                         # Existing: Move to bottom and mark as duplicate
-                        dup_track = existing_map[url]
                         dup_track['is_duplicate'] = True
                         tracks_to_process.append(dup_track)
+                        moved_urls.add(url)
                     else:
                         # New: Add if we haven't reached limit
                         if new_count < 3:
@@ -700,27 +1201,28 @@ class TUI:
                         break
 
                 if tracks_to_process:
-                    # 1. Remove moving tracks from current list
-                    ids_to_remove = {t['url'] for t in tracks_to_process}
-                    self.tracks = [t for t in self.tracks if t['url'] not in ids_to_remove]
+                    # Moved tracks go to the end; the UI loop reveals results one by one
+                    start = time.monotonic()
+                    to_cache = []
+                    cached = self.streamer.get_cached_urls(
+                        [t['url'] for t in tracks_to_process if t['url'] not in moved_urls])
+                    for t in tracks_to_process:
+                        # If it is a new track dict (not already listed), init it
+                        if t['url'] not in moved_urls:
+                             t['is_cached'] = t['url'] in cached
+                             if not t['is_cached']:
+                                 to_cache.append(t)
+                    # Set before the tracks are added, so they never show early
+                    self._pending_reveals = deque(
+                        (start + idx * self.REVEAL_INTERVAL, t)
+                        for idx, t in enumerate(tracks_to_process) if idx)
+                    # Removal and append in one assignment: no half-moved frame
+                    first = self._append_moving(moved_urls, tracks_to_process)
+                    self._enqueue_cache(to_cache)
                     
-                    # 2. Add processed tracks to end one by one with delay
-                    for idx, t in enumerate(tracks_to_process):
-                        # If it is a new track dict (not from existing_map), init it
-                        if t['url'] not in existing_map:
-                             if self.streamer._is_cached(t['url']):
-                                 t['is_cached'] = True
-                             else:
-                                 t['is_cached'] = False
-                                 self.cache_queue.put(t)
-                        self.tracks.append(t)
-                        
-                        # Scroll to bottom to show new track
-                        self.selection_index = len(self.tracks) - 1
-                        
-                        # Add delay between results (except for the last one)
-                        if idx < len(tracks_to_process) - 1:
-                            time.sleep(0.5)
+                    # Scroll to the first result; the rest follow as they appear
+                    self.selection_index = first
+                    self._dirty.set()
 
                     self.msg = f"Found {len(tracks_to_process)} (New: {new_count})"
                 else:
@@ -732,6 +1234,7 @@ class TUI:
         finally:
             self.searching = False
             self.search_query = ""
+            self._dirty.set()
 
     def toggle_play(self):
         if not self.tracks or self.selection_index < 0: return
@@ -747,92 +1250,100 @@ class TUI:
     def play_current(self):
         if 0 <= self.selection_index < len(self.tracks):
             track = self.tracks[self.selection_index]
-            self.streamer.increment_play_count(track['url'])
+            self.streamer.increment_play_count(track['url'], save=False)
+            self._request_save()
             self.streamer.playlist = [track]
             self.streamer.current_index = 0
             self.recommendations_added = False
             threading.Thread(target=self._play_thread, daemon=True).start()
 
     def _play_thread(self):
-        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-            self.streamer.play_playlist(use_cache=True)
+        self.streamer.play_playlist(use_cache=True)
     
     def _check_and_add_recommendations(self):
-        """Проверяет, играет ли последний трек, и добавляет рекомендации"""
-        if not self.tracks or len(self.tracks) == 0:
+        """Проверяет, подходит ли плейлист к концу, и добавляет рекомендации"""
+        if not self.tracks:
             return
         
         # Проверяем, есть ли активный плеер
         if not self.streamer.mpv_process:
             self.recommendations_added = False
+            self._last_checked_pos = None
+            return
+        
+        # Рекомендации уже запрошены — самый частый случай
+        if self.recommendations_added:
             return
         
         # Получаем индекс текущего трека в плейлисте mpv из кеша состояния
-        try:
-            playlist_pos = self.mpv_state.get('playlist-pos')
-            if playlist_pos is None:
-                return
-            
-            # Проверяем, является ли это последним треком
-            is_last_track = (playlist_pos == len(self.streamer.playlist) - 1)
-            
-            if is_last_track and not self.recommendations_added:
-                # Получаем текущий трек
-                current_track = self.streamer.playlist[playlist_pos]
-                
-                # Запускаем поиск рекомендаций в фоновом потоке
-                self.recommendations_added = True
-                threading.Thread(
-                    target=self._add_recommendations_thread,
-                    args=(current_track,),
-                    daemon=True
-                ).start()
-        except:
-            pass
+        # (вызывается на каждом кадре, поэтому проверки вместо try/except)
+        playlist = self.streamer.playlist
+        n = len(playlist)
+        pos = self.mpv_state.get('playlist-pos')
+        # Ответ зависит только от позиции и длины: не изменились — выходим
+        if (pos, n) == self._last_checked_pos:
+            return
+        
+        # Начинаем заранее, чтобы поиск и кеширование шли во время игры,
+        # а не после последнего трека
+        if not isinstance(pos, int) or not 0 <= pos < n or pos < n - self.PREFETCH_LOOKAHEAD:
+            self._last_checked_pos = (pos, n)
+            return
+        
+        # Запускаем поиск рекомендаций в фоновом потоке
+        self.recommendations_added = True
+        self._last_checked_pos = None
+        self._bg_queue.put((self._add_recommendations_thread, (playlist[pos],)))
     
     def _add_recommendations_thread(self, track):
         """Добавляет рекомендации в фоновом потоке"""
         try:
             self.msg = "🔍 Поиск рекомендаций..."
             
-            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
-                recommendations = self.streamer.get_recommendations(track, max_results=3)
+            recommendations = self.streamer.get_recommendations(track, max_results=3)
             
             if recommendations:
-                existing_urls = {t['url'] for t in self.tracks}
-                
+                to_cache = []
+                new_tracks = {}  # url -> rec, в порядке выдачи
+                # Один scandir кеша на всю пачку вместо проверки каждого URL
+                cached = self.streamer.get_cached_urls([rec['url'] for rec in recommendations])
                 for rec in recommendations:
                     # Добавляем только новые треки
-                    if rec['url'] not in existing_urls:
-                        # Проверяем кеш
-                        if self.streamer._is_cached(rec['url']):
-                            rec['is_cached'] = True
-                        else:
-                            rec['is_cached'] = False
-                            self.cache_queue.put(rec)
+                    if rec['url'] not in self._by_url and rec['url'] not in new_tracks:
+                        rec['is_cached'] = rec['url'] in cached
+                        if not rec['is_cached']:
+                            to_cache.append(rec)
                         
                         rec['is_duplicate'] = False
-                        self.tracks.append(rec)
-                        existing_urls.add(rec['url'])
+                        new_tracks[rec['url']] = rec
+                # Весь список разом: UI не отрисует половину пачки
+                self._add_tracks(list(new_tracks.values()))
+                # Одна пачка в очередь кеша вместо put на каждую рекомендацию
+                self._enqueue_cache(to_cache)
                 
-                self.msg = f"✅ Добавлено {len(recommendations)} рекомендаций"
+                self.msg = f"✅ Добавлено {len(new_tracks)} рекомендаций"
             else:
                 self.msg = "⚠️ Рекомендации не найдены"
         except Exception as e:
-            self.msg = "❌ Ошибка при поиске рекомендаций"
+            self.logger.exception("Recommendations fetch failed")
+            self.msg = f"❌ Ошибка при поиске рекомендаций: {e}"
+        finally:
+            self._dirty.set()
 
     def delete_current(self):
          # Same as before
         if not self.tracks or self.selection_index < 0: return
-        if self.selection_index >= len(self.tracks): return
 
-        track = self.tracks[self.selection_index]
-        url = track['url']
+        # Look up and remove under the lock: a search may be publishing a new list
+        with self._tracks_lock:
+            if self.selection_index >= len(self._tracks): return
+            track = self._tracks.pop(self.selection_index)
+            url = track['url']
+            if self._by_url.get(url) is track:
+                del self._by_url[url]
         
         if track.get('is_cached'):
             self.streamer.delete_from_cache(url)
-            
-        del self.tracks[self.selection_index]
         
         if self.selection_index >= len(self.tracks):
              self.selection_index = len(self.tracks) - 1
@@ -841,14 +1352,24 @@ class TUI:
 
 def main():
     try:
-        curses.wrapper(lambda stdscr: TUI(stdscr).run())
+        # Streamer prints would land on top of the curses screen
+        with _silence():
+            curses.wrapper(lambda stdscr: TUI(stdscr).run())
     except KeyboardInterrupt:
         pass
     except Exception:
         import traceback
-        with open("tui_crash.log", "w") as f:
-            f.write(traceback.format_exc())
-        raise
+        # One write of the whole report; curses is already torn down here
+        report = traceback.format_exc().encode("utf-8", "replace")
+        fd = os.open("tui_crash.log", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, report)
+        finally:
+            os.close(fd)
+        if os.getenv("ONLYMUSIC_DEBUG") == "1":
+            raise
+        print("TUI crashed, traceback saved to tui_crash.log (ONLYMUSIC_DEBUG=1 to re-raise)", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
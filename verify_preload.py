@@ -67,42 +67,37 @@ def test_preload_logic():
         with patch.object(streamer, '_download_to_cache', return_value=True) as mock_download:
             result = streamer._ensure_next_track_cached(0)
             assert result == True, "Should return True after successful download"
-            assert mock_download.called, "Should call _download_to_cache"
-            print("   ✅ Correctly triggers download for uncached track")
+            assert mock_download.call_count == 2, "Should download the next two tracks"
+            print("   ✅ Correctly triggers download for uncached tracks")
     
-    # Test 4: Simulate playback monitoring at 80% progress
-    print("\n📋 Test 4: Playback monitoring at 80% progress")
+    # Test 4: One real iteration of the playback monitor
+    print("\n📋 Test 4: Playback monitoring past the preload threshold")
     
     # Mock mpv_process to simulate active playback
     streamer.mpv_process = Mock()
     
-    # Mock the property getters to simulate 80% progress
-    with patch.object(streamer, '_get_mpv_property') as mock_get_prop:
-        def get_property_side_effect(prop):
-            if prop == 'playlist-pos':
-                return 0  # First track
-            elif prop == 'time-pos':
-                return 144  # 80% of 180 seconds
-            elif prop == 'duration':
-                return 180
-            return None
-        
-        mock_get_prop.side_effect = get_property_side_effect
-        
-        with patch.object(streamer, '_ensure_next_track_cached', return_value=True) as mock_ensure:
-            # Simulate one iteration of the monitoring loop
-            playlist_pos = streamer._get_mpv_property('playlist-pos')
-            time_pos = streamer._get_mpv_property('time-pos')
-            duration = streamer._get_mpv_property('duration')
-            
-            if playlist_pos is not None and time_pos and duration:
-                progress = time_pos / duration
-                print(f"   Current progress: {progress*100:.1f}%")
-                
-                if progress >= 0.8:
-                    streamer._ensure_next_track_cached(playlist_pos)
-                    assert mock_ensure.called, "Should call _ensure_next_track_cached at 80%"
-                    print("   ✅ Preload triggered at 80% completion")
+    # First track, 144 of 180 seconds. With no download speed measured yet
+    # the threshold is PRELOAD_PROGRESS; afterwards _prefetch_threshold
+    # derives it from the speed
+    state = {'playlist-pos': 0, 'time-pos': 144, 'duration': 180}
+    threshold = streamer._prefetch_threshold(180, 0)
+    print(f"   Progress: {144 / 180 * 100:.1f}%, threshold: {threshold * 100:.1f}%")
+    
+    def stop_monitor(_seconds):
+        # The monitor sleeps after each poll; end the loop there
+        streamer.mpv_process = None
+    
+    with patch.object(streamer, '_get_mpv_properties', return_value=state) as mock_get_props, \
+            patch.object(streamer, '_ensure_next_track_cached', return_value=True) as mock_ensure, \
+            patch.object(streamer, '_resolve_upcoming_streams') as mock_resolve, \
+            patch('streamer.time.sleep', side_effect=stop_monitor):
+        streamer._monitor_playback_and_preload()
+    
+    mock_get_props.assert_called_once_with(['playlist-pos', 'time-pos', 'duration'])
+    print("   ✅ Read all properties in one request")
+    mock_resolve.assert_called_once_with(0)
+    mock_ensure.assert_called_once_with(0)
+    print("   ✅ Preload triggered past the adaptive threshold")
     
     # Clean up
     streamer.mpv_process = None
@@ -111,7 +106,7 @@ def test_preload_logic():
     print("\n📝 Summary:")
     print("   • Preloading correctly handles edge cases (last track, already cached)")
     print("   • Preloading triggers download when needed")
-    print("   • Monitoring detects 80% progress and triggers preload")
+    print("   • Monitoring triggers preload once the adaptive threshold is passed")
     print("\n✨ The implementation should eliminate playback pauses!")
 
 if __name__ == '__main__':